@@ -1,20 +1,119 @@
 import queue
 import threading
 import time
-import winsound
+import io
+import math
+import struct
+import tempfile
+import wave
 import cv2
 import numpy as np
+import torch
 from ultralytics import YOLO
 import mediapipe as mp
 import sys
 import os
 import json
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QLabel, QMainWindow, QHBoxLayout, 
                            QWidget, QVBoxLayout, QPushButton, QMessageBox, QDialog)
 from PyQt5.QtGui import QImage, QPixmap, QFont
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QTimer, pyqtSignal
+
+# QImage.Format_BGR888 (Qt >= 5.14) lets camera frames be displayed without conversion
+HAS_BGR888 = hasattr(QImage, 'Format_BGR888')
+
+try:
+    import winsound
+except ImportError:
+    winsound = None
+
+try:
+    import simpleaudio
+except ImportError:
+    simpleaudio = None
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def build_beep_wav(frequency=1000, duration=1.0, sample_rate=22050, volume=0.5):
+    """Build a mono 16-bit sine-wave WAV file in memory"""
+    n_samples = int(sample_rate * duration)
+    amplitude = int(32767 * volume)
+    samples = struct.pack(
+        f"<{n_samples}h",
+        *(int(amplitude * math.sin(2 * math.pi * frequency * i / sample_rate)) for i in range(n_samples))
+    )
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(samples)
+    return buffer.getvalue()
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def resize_roi_bilinear(frame, y0, y1, x0, x1, out):
+        """Bilinear-resize frame[y0:y1, x0:x1] into out (pixel-center aligned like cv2.INTER_LINEAR)"""
+        src_h = y1 - y0
+        src_w = x1 - x0
+        out_h, out_w, channels = out.shape
+        scale_y = src_h / out_h
+        scale_x = src_w / out_w
+        for oy in range(out_h):
+            fy = (oy + 0.5) * scale_y - 0.5
+            if fy < 0.0:
+                fy = 0.0
+            iy = min(int(fy), src_h - 1)
+            iy1 = min(iy + 1, src_h - 1)
+            wy = fy - iy
+            for ox in range(out_w):
+                fx = (ox + 0.5) * scale_x - 0.5
+                if fx < 0.0:
+                    fx = 0.0
+                ix = min(int(fx), src_w - 1)
+                ix1 = min(ix + 1, src_w - 1)
+                wx = fx - ix
+                for c in range(channels):
+                    top = frame[y0 + iy, x0 + ix, c] * (1.0 - wx) + frame[y0 + iy, x0 + ix1, c] * wx
+                    bottom = frame[y0 + iy1, x0 + ix, c] * (1.0 - wx) + frame[y0 + iy1, x0 + ix1, c] * wx
+                    out[oy, ox, c] = np.uint8(min(top * (1.0 - wy) + bottom * wy + 0.5, 255.0))
+
+    @njit(cache=True, fastmath=True)
+    def extract_eye_rois(frame, points, padding, left_out, right_out):
+        """Clamp the padded eye boxes from the 7 ROI landmarks and resize both eyes in one pass"""
+        ih, iw = frame.shape[0], frame.shape[1]
+        
+        # Right eye box from points 3 and 4
+        ry0 = max(0, points[3, 1] - padding)
+        ry1 = min(ih, max(0, points[4, 1] + padding))
+        rx0 = max(0, points[3, 0] - padding)
+        rx1 = min(iw, max(0, points[4, 0] + padding))
+        
+        # Left eye box from points 5 and 6 (ordered)
+        lx_min, lx_max = min(points[5, 0], points[6, 0]), max(points[5, 0], points[6, 0])
+        ly_min, ly_max = min(points[5, 1], points[6, 1]), max(points[5, 1], points[6, 1])
+        ly0 = max(0, ly_min - padding)
+        ly1 = min(ih, max(0, ly_max + padding))
+        lx0 = max(0, lx_min - padding)
+        lx1 = min(iw, max(0, lx_max + padding))
+        
+        left_ok = ly1 > ly0 and lx1 > lx0
+        right_ok = ry1 > ry0 and rx1 > rx0
+        if left_ok:
+            resize_roi_bilinear(frame, ly0, ly1, lx0, lx1, left_out)
+        if right_ok:
+            resize_roi_bilinear(frame, ry0, ry1, rx0, rx1, right_out)
+        return left_ok, right_ok
+
 
 class TelegramBot:
     """Simple Telegram bot for emergency alerts - supports multiple recipients"""
@@ -29,42 +128,76 @@ class TelegramBot:
             self.chat_ids = []
         
         self.enabled = bool(bot_token and self.chat_ids)
+        self.send_url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
+        
+        # Pooled keep-alive session to avoid a TCP+TLS handshake per request
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+        
+        # Fan out to recipients concurrently so K chats cost ~1 round trip
+        self.send_pool = ThreadPoolExecutor(max_workers=4)
+        
+        # IP geolocation cache - location barely changes during a drive
+        self.location_cache = None
+        self.location_cache_time = 0
+        self.location_ttl = 600  # Refresh location every 10 minutes
+        self.location_retry_interval = 60  # Back off this long after a failed lookup
+        self.location_retry_after = 0
         
-        # Alert limiting to prevent spam
+        # Alert limiting to prevent spam - token bucket refilled at max_alerts per 5 minutes
         self.max_alerts = max_alerts
-        self.alert_count = 0
-        self.last_reset_time = time.time()
-        self.reset_interval = 300  # Reset counter every 5 minutes
+        self.alert_count = 0  # Total alerts sent
+        self.rate_window = 300  # seconds
+        self.alert_rate = max_alerts / self.rate_window  # tokens per second
+        self.alert_burst = min(2, max_alerts)  # At most this many alerts back to back
+        self.alert_tokens = float(self.alert_burst)
+        self.last_refill_time = time.time()
+        self.token_lock = threading.Lock()
         
+        # Bounded alert queue drained by a single long-lived worker thread
+        self.alert_queue = queue.Queue(maxsize=8)
+        self.alert_worker = None
+        self.dropped_alerts = 0
+        
+    def post_to_chat(self, chat_id, message):
+        """Send message to a single recipient"""
+        try:
+            data = {
+                'chat_id': chat_id,
+                'text': message,
+                'parse_mode': 'HTML'
+            }
+            response = self.session.post(self.send_url, data=data, timeout=10)
+            if response.status_code == 200:
+                return True
+            print(f"❌ Telegram send failed to {chat_id}: {response.status_code}")
+        except Exception as e:
+            print(f"❌ Telegram send failed to {chat_id}: {e}")
+        return False
+    
     def send_message(self, message):
         """Send message to all configured recipients"""
         if not self.enabled:
             return False
-            
-        success_count = 0
-        for chat_id in self.chat_ids:
-            try:
-                url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
-                data = {
-                    'chat_id': chat_id,
-                    'text': message,
-                    'parse_mode': 'HTML'
-                }
-                response = requests.post(url, data=data, timeout=10)
-                if response.status_code == 200:
-                    success_count += 1
-                else:
-                    print(f"❌ Telegram send failed to {chat_id}: {response.status_code}")
-            except Exception as e:
-                print(f"❌ Telegram send failed to {chat_id}: {e}")
         
-        return success_count > 0
+        results = self.send_pool.map(lambda chat_id: self.post_to_chat(chat_id, message), self.chat_ids)
+        return sum(results) > 0
     
     def get_current_location(self):
-        """Get current location using IP geolocation"""
+        """Get current location using IP geolocation (cached)"""
+        current_time = time.time()
+        if self.location_cache and current_time - self.location_cache_time < self.location_ttl:
+            return self.location_cache
+        
+        # Recently failed (e.g. offline) - don't block the alert on another lookup
+        if current_time < self.location_retry_after:
+            return self.location_cache or ("Location unavailable", None)
+        
         try:
             # Use a free IP geolocation service
-            response = requests.get('http://ip-api.com/json/', timeout=5)
+            response = self.session.get('http://ip-api.com/json/', timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data['status'] == 'success':
@@ -77,27 +210,46 @@ class TelegramBot:
                     location_text = f"{city}, {region}, {country}"
                     google_maps_link = f"https://maps.google.com/?q={lat},{lon}"
                     
-                    return location_text, google_maps_link
+                    self.location_cache = (location_text, google_maps_link)
+                    self.location_cache_time = current_time
+                    return self.location_cache
+        except requests.ConnectionError:
+            print("❌ Location fetch failed: offline")
         except Exception as e:
             print(f"❌ Location fetch failed: {e}")
         
-        return "Location unavailable", None
+        # Back off before retrying and keep serving a stale location if we have one
+        self.location_retry_after = current_time + self.location_retry_interval
+        return self.location_cache or ("Location unavailable", None)
     
-    def reset_alert_counter_if_needed(self):
-        """Reset alert counter every 5 minutes"""
-        current_time = time.time()
-        if current_time - self.last_reset_time > self.reset_interval:
-            self.alert_count = 0
-            self.last_reset_time = current_time
-            print("🔄 Alert counter reset")
+    def clear_geo_cache(self):
+        """Invalidate the cached IP geolocation"""
+        self.location_cache = None
+        self.location_cache_time = 0
+        self.location_retry_after = 0
+    
+    def try_consume_alert_token(self):
+        """Refill the token bucket for the elapsed time and take one token if available"""
+        with self.token_lock:
+            current_time = time.time()
+            elapsed = current_time - self.last_refill_time
+            self.alert_tokens = min(self.alert_burst, self.alert_tokens + elapsed * self.alert_rate)
+            self.last_refill_time = current_time
+            
+            if self.alert_tokens >= 1.0:
+                self.alert_tokens -= 1.0
+                return True
+            return False
+    
+    def refund_alert_token(self):
+        """Return a token taken for an alert that failed to send"""
+        with self.token_lock:
+            self.alert_tokens = min(self.alert_burst, self.alert_tokens + 1.0)
     
     def send_emergency_alert(self, microsleep_duration, location="Unknown"):
         """Send emergency drowsiness alert to all recipients (limited to prevent spam)"""
-        # Reset counter if needed
-        self.reset_alert_counter_if_needed()
-        
         # Check if we've reached the alert limit
-        if self.alert_count >= self.max_alerts:
+        if not self.try_consume_alert_token():
             print(f"⚠️ Alert limit reached ({self.max_alerts}/5 min). Skipping to prevent spam.")
             return False
         
@@ -118,7 +270,7 @@ class TelegramBot:
         
         message += (
             f"🕐 Time: {timestamp}\n"
-            f"📊 Alert: {self.alert_count + 1}/{self.max_alerts} (5 min)\n\n"
+            f"📊 Alert #{self.alert_count + 1} (limit {self.max_alerts}/5 min)\n\n"
             f"🚗 <b>DRIVER NEEDS IMMEDIATE ATTENTION!</b>\n"
             f"Please check on the driver immediately."
         )
@@ -126,8 +278,59 @@ class TelegramBot:
         success = self.send_message(message)
         if success:
             self.alert_count += 1
-            print(f"🚨 Emergency alert sent to {len(self.chat_ids)} recipient(s) ({self.alert_count}/{self.max_alerts})")
+            print(f"🚨 Emergency alert sent to {len(self.chat_ids)} recipient(s) (#{self.alert_count})")
+        else:
+            self.refund_alert_token()
         return success
+    
+    def queue_emergency_alert(self, microsleep_duration, location="Unknown", callback=None):
+        """Queue an emergency alert for the background worker (drops when the queue is full)"""
+        if not self.enabled:
+            return False
+        
+        if self.alert_worker is None:
+            self.alert_worker = threading.Thread(target=self.drain_alert_queue, daemon=True)
+            self.alert_worker.start()
+        
+        try:
+            self.alert_queue.put_nowait((microsleep_duration, location, callback))
+            return True
+        except queue.Full:
+            self.dropped_alerts += 1
+            if self.dropped_alerts % 100 == 1:
+                print(f"⚠️ Alert queue full - dropped {self.dropped_alerts} alert(s)")
+            return False
+    
+    def drain_alert_queue(self):
+        """Worker loop sending queued emergency alerts"""
+        while True:
+            item = self.alert_queue.get()
+            if item is None:
+                break
+            
+            microsleep_duration, location, callback = item
+            try:
+                success = self.send_emergency_alert(microsleep_duration, location)
+                if callback:
+                    callback(success)
+            except Exception as e:
+                print(f"❌ Emergency alert failed: {e}")
+    
+    def close(self):
+        """Stop the alert worker thread"""
+        if self.alert_worker is not None:
+            # Never block the GUI thread: a full queue gives up its oldest pending alert for the sentinel
+            while True:
+                try:
+                    self.alert_queue.put_nowait(None)
+                    break
+                except queue.Full:
+                    try:
+                        self.alert_queue.get_nowait()
+                    except queue.Empty:
+                        pass
+            self.alert_worker = None
+        self.send_pool.shutdown(wait=False)
 
 class DeviceSelector(QDialog):
     def __init__(self):
@@ -221,11 +424,45 @@ class DeviceSelector(QDialog):
         self.accept()
 
 class DrowsinessDetector(QMainWindow):
+    # Emitted from the processing thread; delivered to display_frame on the GUI thread
+    frame_ready = pyqtSignal(np.ndarray)
+
+    # Info panel HTML, formatted once per refresh with %-placeholders
+    INFO_TEMPLATE = (
+        "<div style='font-family: Arial, sans-serif; color: #333;'>"
+        "<h2 style='text-align: center; color: #4CAF50;'>Drowsiness Detector</h2>"
+        "<p style='text-align: center; color: #666;'>Device: %s | FPS: %.1f</p>"
+        "<p style='text-align: center; color: #666;'>Emergency Alerts: %s | Threshold: %ss</p>"
+        "<hr style='border: 1px solid #4CAF50;'>"
+        "%s"
+        "<p><b>👁️ Blinks:</b> %s</p>"
+        "<p><b>💤 Microsleeps:</b> %s seconds</p>"
+        "<p><b>😮 Yawns:</b> %s</p>"
+        "<p><b>⏳ Yawn Duration:</b> %s seconds</p>"
+        "<hr style='border: 1px solid #4CAF50;'>"
+        "</div>"
+    )
+
     def __init__(self, device='cpu'):
         super().__init__()
         
         # Device setup
         self.device = device
+        self.use_engine = False
+        self.predict_imgsz = 64  # Small ROIs - also the fixed input size of TensorRT engines
+        self.eye_roi_size = 64  # Eye ROIs are resized to a fixed size for batching
+        self.eye_input_pinned = None  # Pinned staging buffer (PyTorch models on CUDA only)
+        
+        # Ring of preallocated eye ROI outputs for the Numba extractor. Sized so a slot is
+        # never rewritten while still queued (roi_queue) or held by the inference stage.
+        if NUMBA_AVAILABLE:
+            self.eye_roi_ring = np.empty((4, 2, self.eye_roi_size, self.eye_roi_size, 3), np.uint8)
+            self.eye_roi_ring_index = 0
+            # Trigger JIT compilation up front instead of on the first face
+            extract_eye_rois(np.zeros((8, 8, 3), np.uint8), np.zeros((7, 2), np.int32), 1,
+                             self.eye_roi_ring[0, 0], self.eye_roi_ring[0, 1])
+        else:
+            self.eye_roi_ring = None
         self.setup_device()
         
         # Detection states
@@ -233,6 +470,7 @@ class DrowsinessDetector(QMainWindow):
         self.left_eye_state = ''
         self.right_eye_state = ''
         self.alert_text = ''
+        self.emergency_active = False  # Microsleep currently over the emergency threshold
 
         # Counters
         self.blinks = 0
@@ -253,6 +491,23 @@ class DrowsinessDetector(QMainWindow):
         )
         self.points_ids = [187, 411, 152, 68, 174, 399, 298]
 
+        # Temporal decimation of YOLO inference
+        self.frame_idx = 0
+        self.yawn_interval = 3  # Yawns last seconds - run the yawn model every 3rd frame
+        self.ear_ids = [33, 160, 158, 133, 153, 144,   # Left eye
+                        362, 385, 387, 263, 373, 380]  # Right eye
+        self.ear_open_threshold = 0.28  # Above this both eyes are clearly open
+
+        # Preallocated frame buffers reused every frame by the landmark thread
+        self.mesh_input_size = (320, 240)  # (width, height) fed to FaceMesh
+        self.mesh_buffer = None
+        self.rgb_buffer = None
+        self.ensure_rgb_buffer((240, 320, 3))
+        # GUI-thread display buffer, only used when Qt lacks Format_BGR888
+        self.display_buffer = None
+        self.display_qimage = None
+        self.displayed_frame = None
+
         # UI Setup
         device_name = "GPU" if device == 'cuda' else "CPU"
         self.setWindowTitle(f"Drowsiness Detection - {device_name} Mode")
@@ -279,6 +534,9 @@ class DrowsinessDetector(QMainWindow):
         self.fps_start_time = time.time()
         self.current_fps = 0
 
+        # Pre-load the alert sound so playback never blocks the alert thread
+        self.load_alert_sound()
+
         # Initialize Telegram bot
         self.telegram_bot = None
         self.emergency_threshold = 4.0  # seconds
@@ -286,6 +544,13 @@ class DrowsinessDetector(QMainWindow):
 
         self.update_info()
         
+        # Refresh the info panel at ~5 Hz on the GUI thread instead of every frame
+        self.info_dirty = False
+        self.ui_timer = QTimer(self)
+        self.ui_timer.timeout.connect(self.refresh_ui)
+        self.ui_timer.start(200)
+        self.frame_ready.connect(self.display_frame)
+        
         # Load models
         self.load_models()
         
@@ -293,13 +558,18 @@ class DrowsinessDetector(QMainWindow):
         self.setup_camera()
 
         # Threading
-        self.frame_queue = queue.Queue(maxsize=2)
+        self.frame_queue = queue.Queue(maxsize=1)  # Latest-wins slot
+        self.captured_frames = 0
+        self.dropped_frames = 0
         self.stop_event = threading.Event()
+        self.roi_queue = queue.Queue(maxsize=2)  # Landmark stage -> inference stage
         self.capture_thread = threading.Thread(target=self.capture_frames)
         self.process_thread = threading.Thread(target=self.process_frames)
+        self.inference_thread = threading.Thread(target=self.inference_frames)
 
         self.capture_thread.start()
         self.process_thread.start()
+        self.inference_thread.start()
     
     def setup_telegram_bot(self):
         """Setup Telegram bot for emergency alerts"""
@@ -334,6 +604,8 @@ class DrowsinessDetector(QMainWindow):
             try:
                 import torch
                 if torch.cuda.is_available():
+                    # Allow TF32/tensor-core matmuls for FP32 ops left outside FP16 inference
+                    torch.set_float32_matmul_precision('high')
                     print(f"🚀 Using GPU: {torch.cuda.get_device_name(0)}")
                     print(f"CUDA Version: {torch.version.cuda}")
                     print(f"Available GPU memory: {torch.cuda.get_device_properties(0).total_memory / 1024**3:.1f} GB")
@@ -361,38 +633,110 @@ class DrowsinessDetector(QMainWindow):
             sys.exit(1)
         
         try:
-            self.detectyawn = YOLO(yawn_model_path)
-            self.detecteye = YOLO(eye_model_path)
-            
-            # Move models to device if GPU
             if self.device == 'cuda':
-                self.detectyawn.to(self.device)
-                self.detecteye.to(self.device)
-                print("✅ Models loaded on GPU")
+                # Prefer TensorRT FP16 engines on GPU, fall back to .pt checkpoints
+                yawn_engine_path = self.export_engine(yawn_model_path)
+                eye_engine_path = self.export_engine(eye_model_path, batch=2)  # predict_eyes batches both eyes
+                self.use_engine = bool(yawn_engine_path and eye_engine_path)
             else:
-                print("✅ Models loaded on CPU")
+                self.use_engine = False
+            
+            if self.use_engine:
+                self.detectyawn = YOLO(yawn_engine_path, task='detect')
+                self.detecteye = YOLO(eye_engine_path, task='detect')
+                print("✅ TensorRT FP16 engines loaded on GPU")
+            else:
+                self.detectyawn = YOLO(yawn_model_path)
+                self.detecteye = YOLO(eye_model_path)
+                
+                # Fuse Conv+BN layers once instead of on every predictor setup
+                self.detectyawn.fuse()
+                self.detecteye.fuse()
+                
+                # Move models to device if GPU
+                if self.device == 'cuda':
+                    self.detectyawn.to(self.device)
+                    self.detecteye.to(self.device)
+                    self.setup_pinned_buffers()
+                    print("✅ Models loaded on GPU (FP16 inference)")
+                else:
+                    print("✅ Models loaded on CPU")
                 
         except Exception as e:
             QMessageBox.critical(self, "Model Loading Error", f"Failed to load models: {str(e)}")
             sys.exit(1)
     
+    def setup_pinned_buffers(self):
+        """Preallocate pinned host + device input tensors for direct eye-model inference"""
+        try:
+            shape = (2, self.eye_roi_size, self.eye_roi_size, 3)
+            self.eye_input_pinned = torch.empty(shape, dtype=torch.uint8, pin_memory=True)
+            self.eye_input_cuda = torch.empty(shape, dtype=torch.uint8, device=self.device)
+            self.eye_model = self.detecteye.model.half().eval()
+        except Exception as e:
+            print(f"⚠️ Pinned input buffers unavailable, using predict(): {e}")
+            self.eye_input_pinned = None
+    
+    def export_engine(self, model_path, batch=1):
+        """Export a .pt checkpoint to a TensorRT FP16 engine accepting up to `batch` images (cached next to the .pt)"""
+        # The batch size is part of the cache name so a stale batch-1 engine is never reused for batched input
+        suffix = f"_b{batch}.engine" if batch > 1 else ".engine"
+        engine_path = os.path.splitext(model_path)[0] + suffix
+        if os.path.exists(engine_path):
+            return engine_path
+        
+        try:
+            print(f"⚙️ Exporting {model_path} to TensorRT (FP16)...")
+            exported = YOLO(model_path).export(
+                format='engine',
+                half=True,
+                imgsz=self.predict_imgsz,
+                device=0,
+                workspace=2,
+                dynamic=batch > 1,
+                batch=batch
+            )
+            if exported and os.path.exists(exported):
+                if exported != engine_path:
+                    os.replace(exported, engine_path)
+                return engine_path
+        except Exception as e:
+            print(f"⚠️ TensorRT export failed, using PyTorch model: {e}")
+        
+        return None
+    
     def setup_camera(self):
         """Initialize camera with optimal settings"""
-        self.cap = cv2.VideoCapture(0)
+        # Use the native capture backend so MJPG can be negotiated with the driver
+        if sys.platform.startswith('win'):
+            backend = cv2.CAP_DSHOW
+        elif sys.platform.startswith('linux'):
+            backend = cv2.CAP_V4L2
+        else:
+            backend = cv2.CAP_ANY
+        
+        self.cap = cv2.VideoCapture(0, backend)
+        if not self.cap.isOpened():
+            self.cap = cv2.VideoCapture(0)
         if not self.cap.isOpened():
             QMessageBox.critical(self, "Camera Error", "Could not open camera!")
             sys.exit(1)
             
-        # Optimize camera settings
+        # Optimize camera settings - request MJPG before the resolution so the
+        # camera doesn't fall back to raw YUY2 that has to be converted on the CPU
+        self.cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
         self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         self.cap.set(cv2.CAP_PROP_FPS, 30)
         self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         time.sleep(1.0)
-        print("✅ Camera initialized")
         
-    def update_info(self):
-        """Update information panel"""
+        fourcc = int(self.cap.get(cv2.CAP_PROP_FOURCC))
+        fourcc_text = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4))
+        print(f"✅ Camera initialized ({fourcc_text})")
+        
+    def update_alerts(self):
+        """Update alert state and trigger emergency notifications"""
         # Alert logic with emergency notifications
         emergency_triggered = False
         
@@ -406,68 +750,163 @@ class DrowsinessDetector(QMainWindow):
         elif self.microsleeps < 1.0 and self.yawn_duration < 2.0:
             self.alert_text = ""
         
-        # Trigger emergency alerts if threshold exceeded
-        if emergency_triggered and self.telegram_bot and self.telegram_bot.enabled:
-            threading.Thread(
-                target=self.trigger_emergency_alert,
-                daemon=True
-            ).start()
+        # Trigger emergency alerts once per episode, when the microsleep first crosses the threshold
+        # (this runs every frame, so firing on the level would flood the alert queue)
+        was_active = self.emergency_active
+        self.emergency_active = round(self.microsleeps, 2) > self.emergency_threshold
+        if emergency_triggered and not was_active and self.telegram_bot and self.telegram_bot.enabled:
+            self.trigger_emergency_alert()
+        
+        self.info_dirty = True
+
+    def refresh_ui(self):
+        """Timer slot - redraw the information panel if the detector state changed"""
+        if self.info_dirty:
+            self.info_dirty = False
+            self.update_info()
 
+    def update_info(self):
+        """Update information panel"""
         device_display = "🚀 GPU" if self.device == 'cuda' else "💻 CPU"
         emergency_status = "🚨 ON" if (self.telegram_bot and self.telegram_bot.enabled) else "❌ OFF"
         
-        info_text = (
-            f"<div style='font-family: Arial, sans-serif; color: #333;'>"
-            f"<h2 style='text-align: center; color: #4CAF50;'>Drowsiness Detector</h2>"
-            f"<p style='text-align: center; color: #666;'>Device: {device_display} | FPS: {self.current_fps:.1f}</p>"
-            f"<p style='text-align: center; color: #666;'>Emergency Alerts: {emergency_status} | Threshold: {self.emergency_threshold}s</p>"
-            f"<hr style='border: 1px solid #4CAF50;'>"
-            f"{self.alert_text}"
-            f"<p><b>👁️ Blinks:</b> {self.blinks}</p>"
-            f"<p><b>💤 Microsleeps:</b> {round(self.microsleeps,2)} seconds</p>"
-            f"<p><b>😮 Yawns:</b> {self.yawns}</p>"
-            f"<p><b>⏳ Yawn Duration:</b> {round(self.yawn_duration,2)} seconds</p>"
-            f"<hr style='border: 1px solid #4CAF50;'>"
-            f"</div>"
+        info_text = self.INFO_TEMPLATE % (
+            device_display,
+            self.current_fps,
+            emergency_status,
+            self.emergency_threshold,
+            self.alert_text,
+            self.blinks,
+            round(self.microsleeps, 2),
+            self.yawns,
+            round(self.yawn_duration, 2)
         )
         self.info_label.setText(info_text)
 
-    def predict_eye(self, eye_frame, eye_state):
-        """Predict eye state (open/closed)"""
-        if eye_frame.size == 0:
+    def calculate_ear(self, landmarks, iw, ih):
+        """Cheap Eye Aspect Ratio (averaged over both eyes) from MediaPipe landmarks"""
+        coords = np.fromiter(
+            (v for i in self.ear_ids for v in (landmarks[i].x * iw, landmarks[i].y * ih)),
+            dtype=np.float32,
+            count=2 * len(self.ear_ids)
+        ).reshape(2, 6, 2)
+        
+        # Vertical eyelid distances and horizontal eye width for both eyes at once
+        v1 = np.linalg.norm(coords[:, 1] - coords[:, 5], axis=1)
+        v2 = np.linalg.norm(coords[:, 2] - coords[:, 4], axis=1)
+        h = np.linalg.norm(coords[:, 0] - coords[:, 3], axis=1)
+        
+        if np.any(h == 0):
+            return 0.0
+        return float(np.mean((v1 + v2) / (2.0 * h)))
+
+    def eye_state_from_boxes(self, boxes, eye_state):
+        """Map the most confident eye detection to an eye state"""
+        if len(boxes) == 0:
             return eye_state
+
+        # argmax on the device; only two scalars cross to the host
+        max_confidence_index = int(boxes.conf.argmax())
+        class_id = int(boxes.cls[max_confidence_index])
+        confidence = float(boxes.conf[max_confidence_index])
+
+        return self.eye_state_from_prediction(class_id, confidence, eye_state)
+
+    def eye_state_from_prediction(self, class_id, confidence, eye_state):
+        """Map an eye class prediction to an eye state"""
+        if class_id == 1 and confidence > 0.3:  # Closed eye
+            eye_state = "Close Eye"
+        elif class_id == 0 and confidence > 0.25:  # Open eye
+            eye_state = "Open Eye"
+        
+        return eye_state
+
+    def extract_eye_batch(self, frame, points, padding):
+        """Crop + resize both eye ROIs with the Numba kernel into the next ring-buffer slot"""
+        slot_buffers = self.eye_roi_ring[self.eye_roi_ring_index]
+        self.eye_roi_ring_index = (self.eye_roi_ring_index + 1) % len(self.eye_roi_ring)
+        
+        left_ok, right_ok = extract_eye_rois(frame, points, padding, slot_buffers[0], slot_buffers[1])
+        return [(slot, slot_buffers[slot]) for slot, ok in enumerate((left_ok, right_ok)) if ok]
+
+    def prepare_eye_batch(self, left_eye_frame, right_eye_frame):
+        """Resize non-empty eye ROIs to a common size so they can share one batch"""
+        return [(slot, cv2.resize(eye_frame, (self.eye_roi_size, self.eye_roi_size)))
+                for slot, eye_frame in enumerate((left_eye_frame, right_eye_frame))
+                if eye_frame.size > 0]
+
+    def predict_eyes(self, eye_frames):
+        """Predict both eye states (open/closed) in a single batched forward pass"""
+        states = [self.left_eye_state, self.right_eye_state]
+        
+        if not eye_frames:
+            return tuple(states)
+        
+        if self.eye_input_pinned is not None:
+            return self.predict_eyes_pinned(eye_frames, states)
+        
+        batch = [eye_frame for _, eye_frame in eye_frames]
+        batch_slots = [slot for slot, _ in eye_frames]
             
         try:
             # Inference settings based on device
             conf_threshold = 0.25 if self.device == 'cuda' else 0.3
             
-            results_eye = self.detecteye.predict(
-                eye_frame, 
-                device=self.device,
-                verbose=False,
-                conf=conf_threshold,
-                iou=0.45
-            )
+            with torch.inference_mode():
+                results_eye = self.detecteye.predict(
+                    batch, 
+                    device=self.device,
+                    verbose=False,
+                    conf=conf_threshold,
+                    iou=0.45,
+                    half=self.device == 'cuda',
+                    imgsz=self.predict_imgsz,
+                    max_det=1,  # Only the most confident box is used
+                    agnostic_nms=True,
+                    classes=[0, 1]
+                )
             
-            boxes = results_eye[0].boxes
-            if len(boxes) == 0:
-                return eye_state
-
-            confidences = boxes.conf.cpu().numpy()  
-            class_ids = boxes.cls.cpu().numpy()  
-            max_confidence_index = np.argmax(confidences)
-            class_id = int(class_ids[max_confidence_index])
-            confidence = confidences[max_confidence_index]
-
-            if class_id == 1 and confidence > 0.3:  # Closed eye
-                eye_state = "Close Eye"
-            elif class_id == 0 and confidence > 0.25:  # Open eye
-                eye_state = "Open Eye"
+            for slot, result in zip(batch_slots, results_eye):
+                states[slot] = self.eye_state_from_boxes(result.boxes, states[slot])
                                 
         except Exception as e:
             print(f"Eye prediction error: {e}")
             
-        return eye_state
+        return tuple(states)
+
+    def predict_eyes_pinned(self, eye_frames, states):
+        """Batched eye inference via pinned staging buffers and a direct model forward (CUDA)"""
+        try:
+            conf_threshold = 0.25
+            n = len(eye_frames)
+            
+            # Stage the resized ROIs in pinned memory, then overlap the H2D copy
+            staging = self.eye_input_pinned.numpy()
+            for i, (_, eye_frame) in enumerate(eye_frames):
+                np.copyto(staging[i], eye_frame)
+            self.eye_input_cuda[:n].copy_(self.eye_input_pinned[:n], non_blocking=True)
+            
+            with torch.inference_mode():
+                # NHWC uint8 BGR -> NCHW fp16 RGB in [0, 1], all on the GPU
+                x = self.eye_input_cuda[:n].permute(0, 3, 1, 2).flip(1).half().div_(255)
+                preds = self.eye_model(x)
+                if isinstance(preds, (list, tuple)):
+                    preds = preds[0]
+                
+                # (n, 4 + classes, anchors) -> best class score over all anchors,
+                # which is the top box NMS would keep
+                scores = preds[:, 4:, :]
+                confidences, flat_index = scores.flatten(1).max(1)
+                class_ids = flat_index // scores.shape[2]
+            
+            for (slot, _), class_id, confidence in zip(eye_frames, class_ids.tolist(), confidences.tolist()):
+                if confidence >= conf_threshold:
+                    states[slot] = self.eye_state_from_prediction(class_id, confidence, states[slot])
+                    
+        except Exception as e:
+            print(f"Eye prediction error: {e}")
+            
+        return tuple(states)
 
     def predict_yawn(self, yawn_frame):
         """Predict yawn state"""
@@ -477,23 +916,28 @@ class DrowsinessDetector(QMainWindow):
         try:
             conf_threshold = 0.3 if self.device == 'cuda' else 0.35
             
-            results_yawn = self.detectyawn.predict(
-                yawn_frame,
-                device=self.device,
-                verbose=False,
-                conf=conf_threshold,
-                iou=0.45
-            )
+            with torch.inference_mode():
+                results_yawn = self.detectyawn.predict(
+                    yawn_frame,
+                    device=self.device,
+                    verbose=False,
+                    conf=conf_threshold,
+                    iou=0.45,
+                    half=self.device == 'cuda',
+                    imgsz=self.predict_imgsz,
+                    max_det=1,  # Only the most confident box is used
+                    agnostic_nms=True,
+                    classes=[0, 1]
+                )
             
             boxes = results_yawn[0].boxes
             if len(boxes) == 0:
                 return
 
-            confidences = boxes.conf.cpu().numpy()  
-            class_ids = boxes.cls.cpu().numpy()  
-            max_confidence_index = np.argmax(confidences)
-            class_id = int(class_ids[max_confidence_index])
-            confidence = confidences[max_confidence_index]
+            # argmax on the device; only two scalars cross to the host
+            max_confidence_index = int(boxes.conf.argmax())
+            class_id = int(boxes.cls[max_confidence_index])
+            confidence = float(boxes.conf[max_confidence_index])
 
             if class_id == 0 and confidence > 0.4:  # Yawn
                 self.yawn_state = "Yawn"
@@ -504,17 +948,26 @@ class DrowsinessDetector(QMainWindow):
             print(f"Yawn prediction error: {e}")
 
     def capture_frames(self):
-        """Capture frames from camera"""
+        """Capture frames from camera (latest frame wins)"""
         while not self.stop_event.is_set():
             ret, frame = self.cap.read()
             if ret:
-                if self.frame_queue.qsize() < 2:
-                    self.frame_queue.put(frame)
+                self.captured_frames += 1
+                # Replace a stale unprocessed frame so the detector always gets the freshest one
+                try:
+                    self.frame_queue.get_nowait()
+                    self.dropped_frames += 1
+                except queue.Empty:
+                    pass
+                try:
+                    self.frame_queue.put_nowait(frame)
+                except queue.Full:
+                    self.dropped_frames += 1
             else:
                 break
 
     def process_frames(self):
-        """Process captured frames"""
+        """Landmark stage - face mesh, ROI crops and eye ROI resizing"""
         while not self.stop_event.is_set():
             try:
                 frame = self.frame_queue.get(timeout=1)
@@ -526,19 +979,27 @@ class DrowsinessDetector(QMainWindow):
                     self.current_fps = 30 / (current_time - self.fps_start_time)
                     self.fps_start_time = current_time
                 
-                # Face detection
-                image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                # Face detection on a downscaled copy - landmarks are normalized, so the
+                # full-resolution frame is still used for ROI cropping below.
+                # FaceMesh is not re-entrant, so it is only ever used from this thread.
+                mesh_w, mesh_h = self.mesh_input_size
+                small_bgr = self.ensure_mesh_buffer((mesh_h, mesh_w, 3))
+                cv2.resize(frame, self.mesh_input_size, dst=small_bgr, interpolation=cv2.INTER_AREA)
+                image_rgb = self.ensure_rgb_buffer(small_bgr.shape)
+                cv2.cvtColor(small_bgr, cv2.COLOR_BGR2RGB, dst=image_rgb)
                 results = self.face_mesh.process(image_rgb)
 
                 if results.multi_face_landmarks:
                     for face_landmarks in results.multi_face_landmarks:
                         ih, iw, _ = frame.shape
-                        points = []
-
-                        for point_id in self.points_ids:
-                            lm = face_landmarks.landmark[point_id]
-                            x, y = int(lm.x * iw), int(lm.y * ih)
-                            points.append((x, y))
+                        landmarks = face_landmarks.landmark
+                        normalized = np.fromiter(
+                            (v for point_id in self.points_ids
+                             for v in (landmarks[point_id].x, landmarks[point_id].y)),
+                            dtype=np.float32,
+                            count=2 * len(self.points_ids)
+                        ).reshape(-1, 2)
+                        points = (normalized * (iw, ih)).astype(np.int32)
 
                         if len(points) == 7:
                             # Extract ROI coordinates
@@ -563,81 +1024,176 @@ class DrowsinessDetector(QMainWindow):
                             left_eye_roi = frame[max(0, y6-padding):min(ih, y7+padding), 
                                                max(0, x6-padding):min(iw, x7+padding)]
 
-                            # Predictions
-                            self.left_eye_state = self.predict_eye(left_eye_roi, self.left_eye_state)
-                            self.right_eye_state = self.predict_eye(right_eye_roi, self.right_eye_state)
-                            self.predict_yawn(mouth_roi)
-
-                            # Drowsiness logic
-                            if self.left_eye_state == "Close Eye" and self.right_eye_state == "Close Eye":
-                                if not self.left_eye_still_closed and not self.right_eye_still_closed:
-                                    self.left_eye_still_closed, self.right_eye_still_closed = True, True
-                                    self.blinks += 1 
-                                self.microsleeps += 1/30
+                            # Skip the eye model when landmarks already show open eyes
+                            eyes_open = self.calculate_ear(landmarks, iw, ih) > self.ear_open_threshold
+                            if eyes_open:
+                                eye_batch = []
+                            elif self.eye_roi_ring is not None:
+                                eye_batch = self.extract_eye_batch(frame, points, padding)
                             else:
-                                if self.left_eye_still_closed and self.right_eye_still_closed:
-                                    self.left_eye_still_closed, self.right_eye_still_closed = False, False
-                                self.microsleeps = max(0, self.microsleeps - 0.1)
-
-                            if self.yawn_state == "Yawn":
-                                if not self.yawn_in_progress:
-                                    self.yawn_in_progress = True
-                                    self.yawns += 1  
-                                self.yawn_duration += 1/30
-                            else:
-                                if self.yawn_in_progress:
-                                    self.yawn_in_progress = False
-                                    self.yawn_duration = 0
-
-                            self.update_info()
-                            self.display_frame(frame)
+                                eye_batch = self.prepare_eye_batch(left_eye_roi, right_eye_roi)
+                            
+                            # Hand off to the inference stage (blocks briefly for back-pressure)
+                            try:
+                                self.roi_queue.put((frame, eyes_open, eye_batch, mouth_roi), timeout=1)
+                            except queue.Full:
+                                self.dropped_frames += 1
 
             except queue.Empty:
                 continue
             except Exception as e:
                 print(f"Processing error: {e}")
 
+    def inference_frames(self):
+        """Inference stage - YOLO eye/yawn predictions and drowsiness state update"""
+        while not self.stop_event.is_set():
+            try:
+                frame, eyes_open, eye_batch, mouth_roi = self.roi_queue.get(timeout=1)
+                
+                # Predictions
+                if eyes_open:
+                    self.left_eye_state, self.right_eye_state = "Open Eye", "Open Eye"
+                else:
+                    self.left_eye_state, self.right_eye_state = self.predict_eyes(eye_batch)
+                if self.frame_idx % self.yawn_interval == 0:
+                    self.predict_yawn(mouth_roi)
+                self.frame_idx += 1
+
+                # Drowsiness logic
+                if self.left_eye_state == "Close Eye" and self.right_eye_state == "Close Eye":
+                    if not self.left_eye_still_closed and not self.right_eye_still_closed:
+                        self.left_eye_still_closed, self.right_eye_still_closed = True, True
+                        self.blinks += 1 
+                    self.microsleeps += 1/30
+                else:
+                    if self.left_eye_still_closed and self.right_eye_still_closed:
+                        self.left_eye_still_closed, self.right_eye_still_closed = False, False
+                    self.microsleeps = max(0, self.microsleeps - 0.1)
+
+                if self.yawn_state == "Yawn":
+                    if not self.yawn_in_progress:
+                        self.yawn_in_progress = True
+                        self.yawns += 1  
+                    self.yawn_duration += 1/30
+                else:
+                    if self.yawn_in_progress:
+                        self.yawn_in_progress = False
+                        self.yawn_duration = 0
+
+                self.update_alerts()
+                self.frame_ready.emit(frame)
+
+            except queue.Empty:
+                continue
+            except Exception as e:
+                print(f"Inference error: {e}")
+
+    def ensure_rgb_buffer(self, shape):
+        """Return the preallocated RGB buffer, reallocating only if the frame size changes"""
+        if self.rgb_buffer is None or self.rgb_buffer.shape != shape:
+            self.rgb_buffer = np.empty(shape, np.uint8)
+        return self.rgb_buffer
+
+    def ensure_mesh_buffer(self, shape):
+        """Return the preallocated downscaled BGR buffer used as FaceMesh input"""
+        if self.mesh_buffer is None or self.mesh_buffer.shape != shape:
+            self.mesh_buffer = np.empty(shape, np.uint8)
+        return self.mesh_buffer
+
+    def ensure_display_buffer(self, shape):
+        """Return the preallocated display buffer, reallocating only if the frame size changes"""
+        if self.display_buffer is None or self.display_buffer.shape != shape:
+            h, w, ch = shape
+            self.display_buffer = np.empty(shape, np.uint8)
+            self.display_qimage = QImage(self.display_buffer.data, w, h, ch * w, QImage.Format_RGB888)
+        return self.display_buffer
+
     def display_frame(self, frame):
-        """Display frame in GUI"""
-        rgb_image = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        convert_to_Qt_format = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format_RGB888)
-        p = convert_to_Qt_format.scaled(640, 480, Qt.KeepAspectRatio)
+        """Display frame in GUI (runs on the GUI thread via frame_ready)"""
+        if HAS_BGR888:
+            # Zero-copy: wrap the camera's BGR buffer directly (Qt >= 5.14).
+            # Keep a reference so the data outlives the QImage.
+            self.displayed_frame = frame
+            h, w, _ = frame.shape
+            image = QImage(frame.data, w, h, frame.strides[0], QImage.Format_BGR888)
+        else:
+            cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self.ensure_display_buffer(frame.shape))
+            image = self.display_qimage
+        p = image.scaled(640, 480, Qt.KeepAspectRatio)
         self.video_label.setPixmap(QPixmap.fromImage(p))
 
     def trigger_emergency_alert(self):
-        """Trigger emergency alert via Telegram"""
+        """Queue emergency alert via Telegram"""
+        if self.telegram_bot and self.telegram_bot.enabled:
+            # Get current location (you could integrate GPS here)
+            location = "Driver Location Unknown"
+            
+            # Send emergency alert from the bot's worker thread
+            self.telegram_bot.queue_emergency_alert(
+                self.microsleeps, 
+                location,
+                callback=self.on_emergency_alert_sent
+            )
+
+    def on_emergency_alert_sent(self, success):
+        """Handle the result of a queued emergency alert"""
+        if success:
+            print(f"🚨 TELEGRAM ALERT SENT: Microsleep {self.microsleeps:.1f}s")
+            # Play emergency sound
+            self.play_alert_sound()
+        else:
+            print(f"❌ Telegram alert failed")
+
+    def load_alert_sound(self):
+        """Load alert.wav (or synthesize a 1000Hz/1s beep) once at startup"""
+        self.alert_sound_path = None
+        self.alert_sound_wave = None
+        self.alert_sound_tmp = None  # synthesized clip written for winsound, removed on close
+        
+        if os.path.exists("alert.wav"):
+            self.alert_sound_path = os.path.abspath("alert.wav")
+            with open(self.alert_sound_path, 'rb') as f:
+                wav_bytes = f.read()
+        else:
+            wav_bytes = build_beep_wav(1000, 1.0)
+        
         try:
-            if self.telegram_bot and self.telegram_bot.enabled:
-                # Get current location (you could integrate GPS here)
-                location = "Driver Location Unknown"
-                
-                # Send emergency alert
-                success = self.telegram_bot.send_emergency_alert(
-                    self.microsleeps, 
-                    location
-                )
-                
-                if success:
-                    print(f"🚨 TELEGRAM ALERT SENT: Microsleep {self.microsleeps:.1f}s")
-                    # Play emergency sound
-                    try:
-                        winsound.Beep(1000, 1000)  # 1000Hz for 1 second
-                    except:
-                        pass
-                else:
-                    print(f"❌ Telegram alert failed")
-                
+            if winsound:
+                # winsound can't play from memory asynchronously, so keep the clip on disk
+                if not self.alert_sound_path:
+                    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+                        f.write(wav_bytes)
+                        self.alert_sound_path = self.alert_sound_tmp = f.name
+            elif simpleaudio:
+                self.alert_sound_wave = simpleaudio.WaveObject.from_wave_file(io.BytesIO(wav_bytes))
         except Exception as e:
-            print(f"❌ Emergency alert failed: {e}")
+            print(f"⚠️ Alert sound unavailable: {e}")
+
+    def play_alert_sound(self):
+        """Start alert sound playback without blocking"""
+        try:
+            if winsound and self.alert_sound_path:
+                winsound.PlaySound(self.alert_sound_path, winsound.SND_FILENAME | winsound.SND_ASYNC)
+            elif self.alert_sound_wave:
+                self.alert_sound_wave.play()
+        except Exception:
+            pass
 
     def closeEvent(self, event):
         """Clean shutdown"""
         self.stop_event.set()
+        self.ui_timer.stop()
+        if self.telegram_bot:
+            self.telegram_bot.close()
         if hasattr(self, 'cap'):
             self.cap.release()
         cv2.destroyAllWindows()
+        if self.alert_sound_tmp:
+            try:
+                winsound.PlaySound(None, 0)  # stop playback so the file isn't held open
+                os.unlink(self.alert_sound_tmp)
+            except OSError:
+                pass
         event.accept()
 
 def main():
@@ -4,32 +4,190 @@ Cloud Dashboard - EC2 Instance
 Centralized authentication and data visualization for multiple drowsiness detection devices
 """
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, session
+# Green-thread all blocking I/O before anything else imports socket/threading
+import eventlet
+eventlet.monkey_patch()
+
+from eventlet import tpool
+from flask import Flask, Response, render_template, request, redirect, url_for, session, abort
 from flask_socketio import SocketIO, emit, join_room, leave_room
-from datetime import datetime, timedelta
+from jinja2 import FileSystemBytecodeCache
+from datetime import datetime, timezone
 import json
 import os
+import functools
 import hashlib
+import hmac
 import secrets
-from collections import defaultdict
+import time
+import bcrypt
+import orjson
+import itertools
+import queue
+import sqlite3
+import tempfile
+from collections import deque
+from socketio_json import OrjsonCodec
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', secrets.token_hex(32))
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+# Compile templates once and keep the bytecode across restarts
+app.config['TEMPLATES_AUTO_RELOAD'] = False
+app.jinja_env.auto_reload = False
+JINJA_CACHE_DIR = os.path.join(tempfile.gettempdir(), 'drowsiness_jinja_cache')
+os.makedirs(JINJA_CACHE_DIR, exist_ok=True)
+app.jinja_env.bytecode_cache = FileSystemBytecodeCache(JINJA_CACHE_DIR)
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet', json=OrjsonCodec)
+
+# Expected device API key, read once and compared as bytes in constant time
+DEVICE_API_KEY = os.environ.get('DEVICE_API_KEY', 'default_key_change_me').encode()
 
 # In-memory storage (use database in production)
 users_db = {}
 devices_db = {}
-alerts_db = []
-device_stats = defaultdict(lambda: {
-    "status": "offline",
-    "last_seen": None,
-    "total_alerts": 0,
-    "session_start": None,
-    "blinks": 0,
-    "yawns": 0,
-    "location": {"lat": 0, "lng": 0, "address": "Unknown"}
-})
+ALERT_WINDOW = 50000  # Alerts kept in memory; every alert is also spilled to SQLite
+alerts_db = deque(maxlen=ALERT_WINDOW)  # Ordered by ingest time
+alert_times = deque(maxlen=ALERT_WINDOW)  # Parallel ingest epoch seconds for time-window queries
+device_stats = {}  # Allocated per device at registration
+
+def new_device_stats():
+    """Fresh statistics record for a newly registered device"""
+    return {
+        "status": "offline",
+        "last_seen": None,
+        "total_alerts": 0,
+        "session_start": None,
+        "blinks": 0,
+        "yawns": 0,
+        "location": {"lat": 0, "lng": 0, "address": "Unknown"}
+    }
+
+# Running aggregates maintained at the ingest sites (and by the offline sweeper)
+counters = {"online": 0, "alerts": 0}
+OFFLINE_SWEEP_INTERVAL = 30  # seconds
+OFFLINE_TIMEOUT = 90  # seconds without a heartbeat (3 missed 30s heartbeats)
+
+# On-disk alert log (SQLite WAL) for history older than the in-memory window
+ALERTS_DB_PATH = os.environ.get('ALERTS_DB_PATH', 'alerts.db')
+ALERT_FLUSH_INTERVAL = 1  # seconds
+alert_spill_queue = queue.Queue()
+
+def init_alert_store():
+    """Open the SQLite alert log"""
+    conn = sqlite3.connect(ALERTS_DB_PATH, check_same_thread=False)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('CREATE TABLE IF NOT EXISTS alerts (id INTEGER, device_id TEXT, ts_epoch REAL, data BLOB)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_alerts_ts ON alerts (ts_epoch)')
+    conn.commit()
+    return conn
+
+alert_store = init_alert_store()
+
+# Alert ids continue from the on-disk log so they stay unique across restarts
+last_alert_id = alert_store.execute('SELECT COALESCE(MAX(id), 0) FROM alerts').fetchone()[0]
+alert_ids = itertools.count(last_alert_id + 1)
+
+def iso(t):
+    """Format an epoch timestamp as ISO 8601 (UTC) at the response boundary"""
+    if t is None:
+        return None
+    return datetime.fromtimestamp(t, timezone.utc).isoformat()
+
+# Outgoing Socket.IO updates, coalesced into one batch_<event> emit per flush
+EMIT_FLUSH_INTERVAL = 0.1  # seconds
+emit_queue = queue.Queue()
+
+def enqueue_emit(event, payload):
+    """Queue a broadcast for the next coalesced batch"""
+    emit_queue.put((event, payload))
+
+def needs_device(f):
+    """Parse a device request body and resolve its registered device, or reply 404"""
+    @functools.wraps(f)
+    def wrapper(*args, **kwargs):
+        data = read_json()
+        device_id = data.get('device_id')
+        device = devices_db.get(device_id)
+        if device is None:
+            return ojson({"success": False, "error": "Device not registered"}, 404)
+        return f(data, device_id, device, *args, **kwargs)
+    return wrapper
+
+EPOCH_MS_THRESHOLD = 1e11  # larger numeric timestamps are milliseconds
+
+def client_timestamp(value):
+    """Device-supplied timestamp as ISO text (clients send epoch ms, epoch seconds or ISO strings)"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return iso(value / 1000 if value > EPOCH_MS_THRESHOLD else value)
+    return value
+
+def serialize_stats(stats):
+    """Copy of a device_stats record with last_seen formatted for clients"""
+    return {**stats, "last_seen": iso(stats["last_seen"])}
+
+def ojson(obj, status=200):
+    """JSON response serialized with orjson"""
+    return app.response_class(orjson.dumps(obj), status=status, mimetype='application/json')
+
+def read_json():
+    """Parse the request body with orjson"""
+    try:
+        return orjson.loads(request.get_data())
+    except orjson.JSONDecodeError:
+        abort(400)
+
+# Short-lived cache of the serialized dashboard payload, invalidated on device ingest
+DASHBOARD_CACHE_TTL = 0.5  # seconds
+dashboard_version = 0
+dashboard_cache = {"data": None, "body": None, "etag": None, "expires": 0, "version": -1}
+
+def mark_dashboard_dirty():
+    """Invalidate the cached dashboard payload"""
+    global dashboard_version
+    dashboard_version += 1
+
+# Short-lived cache of password verification results to absorb login bursts
+VERIFY_CACHE_TTL = 60  # seconds
+verify_cache = {}
+VERIFY_CACHE_KEY = secrets.token_bytes(32)  # Per-process key so cache keys don't expose password digests
+
+def hash_password(password):
+    """Hash a password with a salted bcrypt KDF"""
+    # bcrypt is CPU-bound; run it in a native thread so the eventlet hub keeps serving
+    return tpool.execute(bcrypt.hashpw, password.encode(), bcrypt.gensalt(rounds=10)).decode()
+
+def is_legacy_hash(stored_hash):
+    """Check for an unsalted SHA-256 hex digest from older users.json files"""
+    return not stored_hash.startswith('$2')
+
+def verify_password(username, password):
+    """Verify a user's password, migrating legacy SHA-256 hashes to bcrypt on success"""
+    stored_hash = users_db[username]['password']
+    
+    # The stored hash is part of the key so a changed password never hits a stale entry
+    key = hashlib.blake2b(f"{username}\0{password}\0{stored_hash}".encode(),
+                          key=VERIFY_CACHE_KEY, digest_size=16).digest()
+    cached = verify_cache.get(key)
+    now = time.monotonic()
+    if cached and cached[0] > now:
+        return cached[1]
+    
+    if is_legacy_hash(stored_hash):
+        verified = secrets.compare_digest(hashlib.sha256(password.encode()).hexdigest(), stored_hash)
+        if verified:
+            users_db[username]['password'] = hash_password(password)
+            mark_users_dirty()
+            return True
+    else:
+        verified = tpool.execute(bcrypt.checkpw, password.encode(), stored_hash.encode())
+    
+    # Drop expired entries occasionally so the cache can't grow without bound
+    if len(verify_cache) > 1024:
+        for k in [k for k, (expires, _) in verify_cache.items() if expires <= now]:
+            del verify_cache[k]
+    verify_cache[key] = (now + VERIFY_CACHE_TTL, verified)
+    return verified
 
 def load_users():
     """Load users from file"""
@@ -38,16 +196,38 @@ def load_users():
             return json.load(f)
     return {
         "admin": {
-            "password": hashlib.sha256("admin123".encode()).hexdigest(),
+            "password": hash_password("admin123"),
             "role": "admin",
             "email": "admin@example.com"
         }
     }
 
+USERS_FLUSH_INTERVAL = 2  # seconds
+users_dirty = False
+
+def mark_users_dirty():
+    """Schedule users.json to be rewritten by the background flusher"""
+    global users_dirty
+    users_dirty = True
+
 def save_users():
-    """Save users to file"""
-    with open('users.json', 'w') as f:
-        json.dump(users_db, f, indent=2)
+    """Save users to file (write to a temp file, then atomically replace)"""
+    with open('users.json.tmp', 'wb') as f:
+        f.write(orjson.dumps(users_db, option=orjson.OPT_INDENT_2))
+    os.replace('users.json.tmp', 'users.json')
+
+def flush_users():
+    """Background task writing users.json at most once per interval"""
+    global users_dirty
+    while True:
+        socketio.sleep(USERS_FLUSH_INTERVAL)
+        if users_dirty:
+            users_dirty = False
+            try:
+                save_users()
+            except OSError as e:
+                users_dirty = True
+                print(f"⚠️  Could not save users: {e}")
 
 # Load users on startup
 users_db = load_users()
@@ -70,24 +250,23 @@ def index():
 def login():
     """User login"""
     if request.method == 'POST':
-        data = request.json if request.is_json else request.form
+        data = read_json() if request.is_json else request.form
         username = data.get('username')
         password = data.get('password')
         
-        if username in users_db:
-            password_hash = hashlib.sha256(password.encode()).hexdigest()
-            if users_db[username]['password'] == password_hash:
+        if username in users_db and password:
+            if verify_password(username, password):
                 session['logged_in'] = True
                 session['username'] = username
                 session['role'] = users_db[username]['role']
                 
                 if request.is_json:
-                    return jsonify({"success": True, "redirect": url_for('index')})
+                    return ojson({"success": True, "redirect": url_for('index')})
                 return redirect(url_for('index'))
         
         error = "Invalid username or password"
         if request.is_json:
-            return jsonify({"success": False, "error": error})
+            return ojson({"success": False, "error": error})
         return render_template('cloud_login.html', error=error)
     
     return render_template('cloud_login.html')
@@ -102,7 +281,7 @@ def logout():
 def register():
     """User registration"""
     if request.method == 'POST':
-        data = request.json if request.is_json else request.form
+        data = read_json() if request.is_json else request.form
         username = data.get('username')
         password = data.get('password')
         email = data.get('email')
@@ -110,20 +289,20 @@ def register():
         if username in users_db:
             error = "Username already exists"
             if request.is_json:
-                return jsonify({"success": False, "error": error})
+                return ojson({"success": False, "error": error})
             return render_template('cloud_register.html', error=error)
         
         # Create new user
         users_db[username] = {
-            "password": hashlib.sha256(password.encode()).hexdigest(),
+            "password": hash_password(password),
             "role": "user",
             "email": email,
             "created_at": datetime.now().isoformat()
         }
-        save_users()
+        mark_users_dirty()
         
         if request.is_json:
-            return jsonify({"success": True, "redirect": url_for('login')})
+            return ojson({"success": True, "redirect": url_for('login')})
         return redirect(url_for('login'))
     
     return render_template('cloud_register.html')
@@ -131,154 +310,291 @@ def register():
 @app.route('/api/device/register', methods=['POST'])
 def register_device():
     """Register a new device"""
-    data = request.json
+    data = read_json()
     device_id = data.get('device_id')
     device_name = data.get('device_name', f'Device-{device_id[:8]}')
     api_key = data.get('api_key')
     
     # Simple API key validation (use proper auth in production)
-    if not api_key or api_key != os.environ.get('DEVICE_API_KEY', 'default_key_change_me'):
-        return jsonify({"success": False, "error": "Invalid API key"}), 401
+    if not api_key or not hmac.compare_digest(str(api_key).encode(), DEVICE_API_KEY):
+        return ojson({"success": False, "error": "Invalid API key"}, 401)
     
     devices_db[device_id] = {
         "name": device_name,
-        "registered_at": datetime.now().isoformat(),
-        "last_seen": datetime.now().isoformat()
+        "registered_at": time.time(),
+        "last_seen": time.time()
     }
+    if device_id not in device_stats:
+        device_stats[device_id] = new_device_stats()
+    
+    mark_dashboard_dirty()
     
-    return jsonify({"success": True, "device_id": device_id})
+    return ojson({"success": True, "device_id": device_id})
 
 @app.route('/api/device/heartbeat', methods=['POST'])
-def device_heartbeat():
+@needs_device
+def device_heartbeat(data, device_id, device):
     """Device heartbeat to update status"""
-    data = request.json
-    device_id = data.get('device_id')
-    
-    if device_id not in devices_db:
-        return jsonify({"success": False, "error": "Device not registered"}), 404
-    
+    if device_stats[device_id]["status"] != "online":
+        counters["online"] += 1
     device_stats[device_id]["status"] = "online"
-    device_stats[device_id]["last_seen"] = datetime.now().isoformat()
-    devices_db[device_id]["last_seen"] = datetime.now().isoformat()
+    now = time.time()
+    device_stats[device_id]["last_seen"] = now
+    device["last_seen"] = now
+    
+    mark_dashboard_dirty()
     
     # Broadcast device status update
-    socketio.emit('device_status', {
+    enqueue_emit('device_status', {
         'device_id': device_id,
         'status': 'online',
-        'last_seen': device_stats[device_id]["last_seen"]
+        'last_seen': iso(now)
     })
     
-    return jsonify({"success": True})
+    return ojson({"success": True})
 
 @app.route('/api/device/alert', methods=['POST'])
-def receive_alert():
+@needs_device
+def receive_alert(data, device_id, device):
     """Receive alert from device"""
-    data = request.json
-    device_id = data.get('device_id')
-    
-    if device_id not in devices_db:
-        return jsonify({"success": False, "error": "Device not registered"}), 404
-    
+    ts_epoch = time.time()
     alert = {
-        "id": len(alerts_db) + 1,
+        "id": next(alert_ids),
         "device_id": device_id,
-        "device_name": devices_db[device_id].get('name', device_id),
-        "timestamp": data.get('timestamp', datetime.now().isoformat()),
+        "device_name": device.get('name', device_id),
+        "timestamp": client_timestamp(data.get('timestamp')) or iso(ts_epoch),
         "duration": data.get('duration', 0),
         "location": data.get('location', {}),
-        "severity": "critical" if data.get('duration', 0) > 5 else "warning"
+        "severity": "critical" if data.get('duration', 0) > 5 else "warning",
+        "ts_epoch": ts_epoch
     }
     
     alerts_db.append(alert)
+    alert_times.append(ts_epoch)
+    alert_spill_queue.put(alert)
     device_stats[device_id]["total_alerts"] += 1
+    counters["alerts"] += 1
+    mark_dashboard_dirty()
     
     # Broadcast alert to all connected clients
-    socketio.emit('new_alert', alert)
+    enqueue_emit('new_alert', alert)
     
-    return jsonify({"success": True, "alert_id": alert["id"]})
+    return ojson({"success": True, "alert_id": alert["id"]})
 
-@app.route('/api/device/stats', methods=['POST'])
-def receive_stats():
-    """Receive statistics from device"""
-    data = request.json
-    device_id = data.get('device_id')
-    
-    if device_id not in devices_db:
-        return jsonify({"success": False, "error": "Device not registered"}), 404
-    
-    # Update device statistics
-    stats = data.get('stats', {})
-    device_stats[device_id].update({
+def apply_stats(device_id, stats, location=None):
+    """Store a device stats snapshot and broadcast it; returns False if nothing changed"""
+    current = device_stats[device_id]
+    update = {
         "blinks": stats.get('blink_count', 0),
         "yawns": stats.get('yawn_count', 0),
         "continuous_sleep": stats.get('continuous_sleep', 0),
         "fps": stats.get('fps', 0),
-        "location": data.get('location', device_stats[device_id]["location"])
-    })
+        "location": location or current["location"]
+    }
+    
+    # Steady-state telemetry often repeats the last snapshot; skip the broadcast then
+    if all(current.get(k) == v for k, v in update.items()):
+        return False
+    
+    current.update(update)
+    mark_dashboard_dirty()
     
     # Broadcast stats update
-    socketio.emit('device_stats', {
+    enqueue_emit('device_stats', {
         'device_id': device_id,
-        'stats': device_stats[device_id]
+        'stats': serialize_stats(current)
     })
-    
-    return jsonify({"success": True})
+    return True
 
-@app.route('/api/dashboard/data')
-def get_dashboard_data():
-    """Get all dashboard data"""
-    if not session.get('logged_in'):
-        return jsonify({"error": "Unauthorized"}), 401
+@app.route('/api/device/stats', methods=['POST'])
+@needs_device
+def receive_stats(data, device_id, device):
+    """Receive statistics from device"""
+    if not apply_stats(device_id, data.get('stats', {}), data.get('location')):
+        return ojson({"success": True, "noop": True})
+    return ojson({"success": True})
+
+@app.route('/api/device/stats/batch', methods=['POST'])
+@needs_device
+def receive_stats_batch(data, device_id, device):
+    """Receive a batch of statistics snapshots from device"""
+    batch = data.get('batch') or []
+    if not batch:
+        return ojson({"success": True, "noop": True})
     
+    # Snapshots are cumulative, so only the newest one changes the dashboard
+    latest = batch[-1]
+    if not apply_stats(device_id, latest.get('stats', {}), latest.get('location')):
+        return ojson({"success": True, "noop": True, "received": len(batch)})
+    return ojson({"success": True, "received": len(batch)})
+
+def build_dashboard_data():
+    """Build the dashboard payload from current state"""
     # Calculate summary statistics
     total_devices = len(devices_db)
-    online_devices = sum(1 for d in device_stats.values() if d["status"] == "online")
-    total_alerts = len(alerts_db)
-    recent_alerts = [a for a in alerts_db if 
-                    datetime.fromisoformat(a['timestamp']) > datetime.now() - timedelta(hours=24)]
+    online_devices = counters["online"]
+    total_alerts = counters["alerts"]
+    cutoff = time.time() - 24 * 3600
+    alerts_24h = sum(1 for _ in alerts_since(cutoff))
+    if window_truncated(cutoff):
+        alerts_24h += alert_store.execute(
+            'SELECT COUNT(*) FROM alerts WHERE ts_epoch > ? AND ts_epoch < ?',
+            (cutoff, alert_times[0])
+        ).fetchone()[0]
     
-    return jsonify({
+    return {
         "summary": {
             "total_devices": total_devices,
             "online_devices": online_devices,
             "offline_devices": total_devices - online_devices,
             "total_alerts": total_alerts,
-            "alerts_24h": len(recent_alerts)
+            "alerts_24h": alerts_24h
         },
         "devices": [
             {
                 "id": device_id,
                 "name": device_info.get('name', device_id),
                 "status": device_stats[device_id]["status"],
-                "last_seen": device_stats[device_id]["last_seen"],
-                "stats": device_stats[device_id]
+                "last_seen": iso(device_stats[device_id]["last_seen"]),
+                "stats": serialize_stats(device_stats[device_id])
             }
             for device_id, device_info in devices_db.items()
         ],
-        "recent_alerts": sorted(alerts_db, key=lambda x: x['timestamp'], reverse=True)[:20]
-    })
+        # alerts_db is in ingest order, so the newest 20 are simply its tail
+        "recent_alerts": list(itertools.islice(reversed(alerts_db), 20))
+    }
+
+def get_dashboard_payload():
+    """Return the cached dashboard payload, rebuilding it when stale or invalidated"""
+    now = time.monotonic()
+    if now >= dashboard_cache["expires"] or dashboard_cache["version"] != dashboard_version:
+        version = dashboard_version
+        data = build_dashboard_data()
+        body = orjson.dumps(data)
+        dashboard_cache.update({
+            "data": data,
+            "body": body,
+            "etag": hashlib.blake2b(body, digest_size=8).hexdigest(),
+            "expires": now + DASHBOARD_CACHE_TTL,
+            "version": version
+        })
+    return dashboard_cache
+
+@app.route('/api/dashboard/data')
+def get_dashboard_data():
+    """Get all dashboard data"""
+    if not session.get('logged_in'):
+        return ojson({"error": "Unauthorized"}, 401)
+    
+    payload = get_dashboard_payload()
+    etag = f'"{payload["etag"]}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers={"ETag": etag})
+    
+    return Response(payload["body"], mimetype='application/json', headers={"ETag": etag})
 
 @app.route('/api/alerts/history')
 def get_alerts_history():
     """Get alert history with filtering"""
     if not session.get('logged_in'):
-        return jsonify({"error": "Unauthorized"}), 401
+        return ojson({"error": "Unauthorized"}, 401)
     
     device_id = request.args.get('device_id')
     hours = int(request.args.get('hours', 24))
     
-    cutoff_time = datetime.now() - timedelta(hours=hours)
+    cutoff = time.time() - hours * 3600
     filtered_alerts = [
-        a for a in alerts_db
-        if datetime.fromisoformat(a['timestamp']) > cutoff_time
-        and (not device_id or a['device_id'] == device_id)
+        a for a in alerts_since(cutoff)
+        if not device_id or a['device_id'] == device_id
     ]
     
-    return jsonify({
-        "alerts": sorted(filtered_alerts, key=lambda x: x['timestamp'], reverse=True),
+    # Older alerts that have been evicted from memory come from the SQLite log
+    if window_truncated(cutoff):
+        filtered_alerts.extend(query_spilled_alerts(cutoff, alert_times[0], device_id))
+    
+    return ojson({
+        "alerts": filtered_alerts,
         "count": len(filtered_alerts)
     })
 
+def alerts_since(cutoff):
+    """In-memory alerts newer than cutoff, newest first"""
+    # alerts_db is in ingest order: walk back from the tail and stop at the first older alert
+    recent = itertools.takewhile(lambda pair: pair[1] > cutoff, zip(reversed(alerts_db), reversed(alert_times)))
+    return (alert for alert, _ in recent)
+
+def window_truncated(cutoff):
+    """Whether alerts after cutoff may have been evicted from the in-memory window"""
+    return len(alerts_db) == ALERT_WINDOW and cutoff < alert_times[0]
+
+def query_spilled_alerts(cutoff, before, device_id=None):
+    """Alerts from the SQLite log in (cutoff, before), newest first"""
+    sql = 'SELECT data FROM alerts WHERE ts_epoch > ? AND ts_epoch < ?'
+    params = [cutoff, before]
+    if device_id:
+        sql += ' AND device_id = ?'
+        params.append(device_id)
+    sql += ' ORDER BY ts_epoch DESC'
+    return [orjson.loads(row[0]) for row in alert_store.execute(sql, params)]
+
+def flush_alert_spill():
+    """Background task batching queued alerts into the SQLite log"""
+    while True:
+        socketio.sleep(ALERT_FLUSH_INTERVAL)
+        batch = []
+        while True:
+            try:
+                batch.append(alert_spill_queue.get_nowait())
+            except queue.Empty:
+                break
+        if not batch:
+            continue
+        try:
+            alert_store.executemany(
+                'INSERT INTO alerts VALUES (?, ?, ?, ?)',
+                [(a['id'], a['device_id'], a['ts_epoch'], orjson.dumps(a)) for a in batch]
+            )
+            alert_store.commit()
+        except sqlite3.Error as e:
+            print(f"⚠️  Alert spill failed: {e}")
+
+def flush_emits():
+    """Background task draining queued updates into one emit per event type"""
+    while True:
+        socketio.sleep(EMIT_FLUSH_INTERVAL)
+        batches = {}
+        while True:
+            try:
+                event, payload = emit_queue.get_nowait()
+            except queue.Empty:
+                break
+            batches.setdefault(event, []).append(payload)
+        for event, payloads in batches.items():
+            socketio.emit('batch_' + event, payloads)
+
+def sweep_offline_devices():
+    """Background task marking devices offline when their heartbeats stop"""
+    while True:
+        socketio.sleep(OFFLINE_SWEEP_INTERVAL)
+        cutoff = time.time() - OFFLINE_TIMEOUT
+        for device_id, stats in list(device_stats.items()):
+            if stats["status"] != "online" or stats["last_seen"] is None:
+                continue
+            if stats["last_seen"] < cutoff:
+                stats["status"] = "offline"
+                counters["online"] -= 1
+                mark_dashboard_dirty()
+                enqueue_emit('device_status', {
+                    'device_id': device_id,
+                    'status': 'offline',
+                    'last_seen': iso(stats["last_seen"])
+                })
+
+socketio.start_background_task(sweep_offline_devices)
+socketio.start_background_task(flush_alert_spill)
+socketio.start_background_task(flush_emits)
+socketio.start_background_task(flush_users)
+
 # WebSocket events
 @socketio.on('connect')
 def handle_connect():
@@ -286,7 +602,7 @@ def handle_connect():
     if session.get('logged_in'):
         emit('connection_response', {'status': 'connected'})
         # Send current dashboard data
-        emit('dashboard_update', get_dashboard_data().json)
+        emit('dashboard_update', get_dashboard_payload()["data"])
 
 @socketio.on('disconnect')
 def handle_disconnect():
@@ -314,6 +630,7 @@ if __name__ == '__main__':
     print("📊 Dashboard: http://0.0.0.0:5000")
     print("🔐 Default login: admin / admin123")
     print("⚠️  Change default password in production!")
+    print("💡 For production run under gunicorn: gunicorn -k eventlet -w 1 --worker-connections 2000 --bind 0.0.0.0:5000 wsgi:app")
     
-    # Run on all interfaces for EC2
+    # Run on all interfaces for EC2 (development server)
     socketio.run(app, host='0.0.0.0', port=5000, debug=False)
@@ -26,7 +26,7 @@ source venv/bin/activate
 # Install Python packages
 echo "[4/6] Installing Python packages..."
 pip install --upgrade pip
-pip install Flask==3.0.0 flask-socketio==5.3.5 python-socketio==5.10.0 requests==2.31.0
+pip install Flask==3.0.0 flask-socketio==5.3.5 python-socketio==5.10.0 python-engineio==4.8.0 eventlet==0.33.3 gunicorn==21.2.0 bcrypt==4.1.2 orjson==3.9.10 requests==2.31.0
 
 # Create systemd service
 echo "[5/6] Creating systemd service..."
@@ -41,7 +41,7 @@ User=$USER
 WorkingDirectory=$HOME/drowsiness-cloud
 Environment="PATH=$HOME/drowsiness-cloud/venv/bin"
 Environment="DEVICE_API_KEY=change_this_api_key_in_production"
-ExecStart=$HOME/drowsiness-cloud/venv/bin/python cloud_dashboard.py
+ExecStart=$HOME/drowsiness-cloud/venv/bin/gunicorn -k eventlet -w 1 --worker-connections 2000 --bind 0.0.0.0:5000 wsgi:app
 Restart=always
 RestartSec=10
 
@@ -61,7 +61,7 @@ echo " Deployment Complete!"
 echo "========================================="
 echo ""
 echo "Next steps:"
-echo "1. Copy cloud_dashboard.py to ~/drowsiness-cloud/"
+echo "1. Copy cloud_dashboard.py, socketio_json.py and wsgi.py to ~/drowsiness-cloud/"
 echo "2. Copy templates/ folder to ~/drowsiness-cloud/"
 echo "3. Start service: sudo systemctl start drowsiness-cloud"
 echo "4. Enable on boot: sudo systemctl enable drowsiness-cloud"
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""
+Numba kernels for per-frame landmark math shared by the MediaPipe detectors
+"""
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+# Landmark order expected by ear_mar: left eye p1..p6, right eye p1..p6, then mouth 14, 17, 13, 267
+RATIO_IDX = (33, 160, 158, 133, 153, 144, 362, 385, 387, 263, 373, 380, 14, 17, 13, 267)
+
+
+def gather_ratio_points(landmarks, out):
+    """Copy the RATIO_IDX landmark (x, y) pairs into a preallocated (16, 2) float32 array"""
+    lm = landmarks.landmark
+    for row, i in enumerate(RATIO_IDX):
+        p = lm[i]
+        out[row, 0] = p.x
+        out[row, 1] = p.y
+    return out
+
+
+if NUMBA_AVAILABLE:
+    @njit(cache=True, fastmath=True)
+    def _dist(pts, a, b):
+        dx = pts[a, 0] - pts[b, 0]
+        dy = pts[a, 1] - pts[b, 1]
+        return np.sqrt(dx * dx + dy * dy)
+
+    @njit(cache=True, fastmath=True)
+    def ear_mar(pts):
+        """(EAR averaged over both eyes, MAR) from points gathered in RATIO_IDX order"""
+        ear = 0.0
+        for o in (0, 6):
+            h = _dist(pts, o, o + 3)
+            if h > 0:
+                ear += (_dist(pts, o + 1, o + 5) + _dist(pts, o + 2, o + 4)) / (2.0 * h)
+            else:
+                ear += 0.3
+        h = _dist(pts, 14, 15)
+        mar = _dist(pts, 12, 13) / h if h > 0 else 0.0
+        return ear / 2.0, mar
+
+    # Compile (or load the cached binary) at import rather than on the first face
+    ear_mar(np.zeros((len(RATIO_IDX), 2), np.float32))
@@ -5,21 +5,84 @@ Hybrid Drowsiness Detection System
 - Web Mode: Browser-based detection
 """
 
+# Green-thread the network stack for the web server; OS threads stay native so the
+# camera/MediaPipe loops keep running on real threads
+import eventlet
+eventlet.monkey_patch(thread=False)
+from eventlet import tpool
+
 import cv2
+import logging
+import logging.handlers
 import threading
+import queue
 import time
 import json
 import os
+import sys
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import SimpleNamespace
 import numpy as np
 from ultralytics import YOLO
 import mediapipe as mp
+from detector_kernels import NUMBA_AVAILABLE, gather_ratio_points
+if NUMBA_AVAILABLE:
+    from detector_kernels import ear_mar
 from DrowsinessDetector_Universal import TelegramBot
 from flask import Flask, render_template, jsonify, request, redirect, url_for, session
 from flask_socketio import SocketIO
 import winsound
 
+# Optional libjpeg-turbo encoder for web-mode streaming
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# MediaPipe Tasks FaceLandmarker (GPU delegate) is used when its model bundle is present
+FACE_LANDMARKER_MODEL = 'face_landmarker.task'
+try:
+    from mediapipe.tasks import python as mp_tasks
+    from mediapipe.tasks.python import vision as mp_vision
+    MP_TASKS_AVAILABLE = True
+except ImportError:
+    MP_TASKS_AVAILABLE = False
+
+class GpuFaceMesh:
+    """FaceLandmarker on the GPU delegate behind the legacy FaceMesh process()/close() interface"""
+    def __init__(self, model_path):
+        options = mp_vision.FaceLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(
+                model_asset_path=model_path,
+                delegate=mp_tasks.BaseOptions.Delegate.GPU
+            ),
+            running_mode=mp_vision.RunningMode.VIDEO,
+            num_faces=1,
+            min_face_detection_confidence=0.5,
+            min_tracking_confidence=0.5,
+            output_face_blendshapes=False
+        )
+        self.landmarker = mp_vision.FaceLandmarker.create_from_options(options)
+        self.start_time = time.monotonic()
+        self.last_timestamp = -1
+    
+    def process(self, image_rgb):
+        """Run the landmarker; results mimic FaceMesh's multi_face_landmarks"""
+        # VIDEO mode requires strictly increasing timestamps
+        timestamp = max(int((time.monotonic() - self.start_time) * 1000), self.last_timestamp + 1)
+        self.last_timestamp = timestamp
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+        result = self.landmarker.detect_for_video(image, timestamp)
+        faces = [SimpleNamespace(landmark=landmarks) for landmarks in result.face_landmarks]
+        return SimpleNamespace(multi_face_landmarks=faces or None)
+    
+    def close(self):
+        self.landmarker.close()
+
 # Import cloud client
 try:
     from local_client import CloudClient, load_cloud_config
@@ -28,18 +91,60 @@ except ImportError:
     CLOUD_AVAILABLE = False
     print("⚠️  Cloud client not available")
 
+# Detection-loop logging goes through a queue so the hot path never blocks on stdout
+logger = logging.getLogger('hybrid_detector')
+logger.setLevel(logging.INFO)
+logger.propagate = False
+log_queue = queue.Queue(-1)
+logger.addHandler(logging.handlers.QueueHandler(log_queue))
+log_listener = logging.handlers.QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+log_listener.start()
+
+def frozen_indices(*indices):
+    """Read-only index array built once at import"""
+    array = np.array(indices, dtype=np.intp)
+    array.setflags(write=False)
+    return array
+
+# Landmark indices: left eye then right eye as (p1..p6), and the mouth points MAR uses
+EYE_IDX = (33, 160, 158, 133, 153, 144, 362, 385, 387, 263, 373, 380)
+MOUTH_IDX = (14, 17, 13, 267)
+# Row pairs within the gathered points: eye verticals, eye horizontals, mouth vertical/horizontal
+EYE_V_A, EYE_V_B = frozen_indices(1, 2, 7, 8), frozen_indices(5, 4, 11, 10)
+EYE_H_A, EYE_H_B = frozen_indices(0, 6), frozen_indices(3, 9)
+MOUTH_A, MOUTH_B = frozen_indices(0, 2), frozen_indices(1, 3)
+
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'drowsiness_detection_2024'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", async_mode='eventlet')
+
+# Emits from native threads are handed to a green task; eventlet sockets aren't thread-safe
+emit_queue = queue.Queue()
+
+def emit_from_thread(event, data, callback=None):
+    """Queue a Socket.IO broadcast from a native thread"""
+    emit_queue.put((event, data, callback))
+
+def emit_worker():
+    """Green background task delivering queued emits"""
+    while True:
+        # Block on the native queue in an eventlet tpool thread: the green task sleeps until an
+        # emit arrives while the hub keeps serving (a direct get() would stall the hub)
+        event, data, callback = tpool.execute(emit_queue.get)
+        socketio.emit(event, data, callback=callback)
+
+socketio.start_background_task(emit_worker)
 
 class HybridDrowsinessDetector:
     def __init__(self):
         self.mode = "pc"  # "pc" or "web"
         self.detection_active = False
-        self.camera = None
+        self.stop_event = threading.Event()  # Replaced per session; a finishing loop only sets its own
         self.telegram_bot = None
         self.config = self.load_config()
         self.current_location = {"lat": 0, "lng": 0, "address": "Unknown"}
+        self.location_cache_time = None
+        self.location_ttl = 60  # seconds
         
         # Statistics
         self.stats = {
@@ -54,10 +159,65 @@ class HybridDrowsinessDetector:
             "frames_processed": 0
         }
         
+        # MediaPipe runs on a downscaled copy; landmarks are normalized so the math is unchanged
+        self.mesh_input_size = (320, 240)
+        self.mesh_buffer = np.empty((self.mesh_input_size[1], self.mesh_input_size[0], 3), np.uint8)
+        self.rgb_buffer = np.empty_like(self.mesh_buffer)
+        
+        # PC mode runs the mesh on alternate frames and holds its EAR/MAR in between;
+        # blinks last several frames at 30 FPS so nothing is missed
+        self.pc_mesh_interval = 2
+        self.mesh_frame_index = 0
+        self.last_ratios = None
+        
+        # Landmark buffer for the JIT EAR/MAR kernel
+        self.ratio_points = np.empty((16, 2), np.float32)
+        
         # Detection variables
         self.eyes_closed_frames = 0
         self.yawn_frames = 0
         self.continuous_sleep_time = 0.0
+        self.max_frame_dt = 0.2  # seconds
+        
+        # Keep-alive HTTP session for location and Telegram API calls
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        
+        # Network I/O for alerts runs off the detection thread
+        self.io_pool = ThreadPoolExecutor(max_workers=4)
+        self.alert_future = None
+        self.location_future = None
+        self.alert_cooldown = 10  # seconds between alerts while the driver stays over the threshold
+        self.last_alert_time = None
+        
+        # ISO timestamp for per-frame emits, reformatted at most once per second
+        self.iso_second = None
+        self.iso_text = None
+        
+        # Per-frame PC-mode updates are sent to the browser in small batches
+        self.emit_buffer = []
+        self.emit_flush_time = time.monotonic()
+        self.emit_interval = 0.1  # seconds
+        self.emit_batch_size = 3
+        
+        # JPEG encoder for web mode (falls back to cv2.imencode)
+        self.jpeg = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self.jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️ TurboJPEG unavailable, using OpenCV encoder: {e}")
+        
+        # Web-mode frame in flight to the browser (cleared by its ack, or after a timeout)
+        self.frame_lock = threading.Lock()
+        self.frame_sent_at = None
+        self.frame_ack_timeout = 1.0  # seconds
+        
+        # Alert beeps play on their own thread; a pending beep absorbs new ones
+        self.beep_queue = queue.Queue(maxsize=1)
+        threading.Thread(target=self.beep_worker, daemon=True).start()
         
         # Initialize models and bot
         self.setup_models()
@@ -101,6 +261,23 @@ class HybridDrowsinessDetector:
         except Exception as e:
             print(f"❌ Model loading failed: {e}")
     
+    def create_face_mesh(self):
+        """Create the face landmark model, preferring the GPU FaceLandmarker"""
+        if MP_TASKS_AVAILABLE and os.path.exists(FACE_LANDMARKER_MODEL):
+            try:
+                face_mesh = GpuFaceMesh(FACE_LANDMARKER_MODEL)
+                print("✅ FaceLandmarker running on GPU")
+                return face_mesh
+            except Exception as e:
+                print(f"⚠️ GPU FaceLandmarker unavailable, using CPU Face Mesh: {e}")
+        
+        return self.mp_face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=True,
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.5
+        )
+    
     def setup_telegram_bot(self):
         """Setup Telegram bot"""
         if self.config.get('bot_token') and self.config.get('chat_ids'):
@@ -130,9 +307,12 @@ class HybridDrowsinessDetector:
                     print(f"⚠️  Cloud client error: {e}")
     
     def get_current_location(self):
-        """Get current location"""
+        """Get current location (cached for location_ttl seconds)"""
+        if self.location_cache_time is not None and time.monotonic() - self.location_cache_time < self.location_ttl:
+            return self.current_location
+        
         try:
-            response = requests.get('http://ip-api.com/json/', timeout=5)
+            response = self.http.get('http://ip-api.com/json/', timeout=2)
             if response.status_code == 200:
                 data = response.json()
                 if data['status'] == 'success':
@@ -141,41 +321,31 @@ class HybridDrowsinessDetector:
                         "lng": data.get('lon', 0),
                         "address": f"{data.get('city', 'Unknown')}, {data.get('regionName', 'Unknown')}, {data.get('country', 'Unknown')}"
                     }
+                    self.location_cache_time = time.monotonic()
         except Exception as e:
             print(f"❌ Location fetch failed: {e}")
         
         return self.current_location
     
+    @staticmethod
+    def landmark_points(landmarks, indices):
+        """Gather (x, y) of the given landmarks into an (N, 2) array"""
+        lm = landmarks.landmark
+        return np.array([(lm[i].x, lm[i].y) for i in indices], dtype=np.float32)
+    
     def calculate_ear(self, landmarks):
         """Calculate Eye Aspect Ratio"""
         try:
-            # Left eye landmarks
-            left_eye = [33, 160, 158, 133, 153, 144]
-            # Right eye landmarks
-            right_eye = [362, 385, 387, 263, 373, 380]
+            pts = self.landmark_points(landmarks, EYE_IDX)
             
-            def get_ear(eye_points):
-                coords = []
-                for i in eye_points:
-                    lm = landmarks.landmark[i]
-                    coords.append([lm.x, lm.y])
-                coords = np.array(coords)
-                
-                # Vertical distances
-                v1 = np.linalg.norm(coords[1] - coords[5])
-                v2 = np.linalg.norm(coords[2] - coords[4])
-                
-                # Horizontal distance
-                h = np.linalg.norm(coords[0] - coords[3])
-                
-                if h > 0:
-                    return (v1 + v2) / (2.0 * h)
-                return 0.3
+            # Vertical distances (two per eye) and horizontal distance per eye, in one pass
+            dv = pts[EYE_V_A] - pts[EYE_V_B]
+            dh = pts[EYE_H_A] - pts[EYE_H_B]
+            v = np.hypot(dv[:, 0], dv[:, 1]).reshape(2, 2).sum(axis=1)
+            h = np.hypot(dh[:, 0], dh[:, 1])
             
-            left_ear = get_ear(left_eye)
-            right_ear = get_ear(right_eye)
-            
-            return (left_ear + right_ear) / 2.0
+            ears = np.where(h > 0, v / (2.0 * np.where(h > 0, h, 1.0)), 0.3)
+            return float(ears.mean())
             
         except Exception as e:
             return 0.3
@@ -183,31 +353,116 @@ class HybridDrowsinessDetector:
     def calculate_mar(self, landmarks):
         """Calculate Mouth Aspect Ratio"""
         try:
-            # Mouth landmarks
-            mouth_points = [13, 14, 269, 270, 267, 271, 272, 17]
-            
-            coords = []
-            for i in mouth_points:
-                lm = landmarks.landmark[i]
-                coords.append([lm.x, lm.y])
-            coords = np.array(coords)
-            
-            # Vertical distance
-            v1 = np.linalg.norm(coords[1] - coords[7])
+            pts = self.landmark_points(landmarks, MOUTH_IDX)
             
-            # Horizontal distance
-            h = np.linalg.norm(coords[0] - coords[4])
+            # Vertical (14-17) and horizontal (13-267) distances
+            d = pts[MOUTH_A] - pts[MOUTH_B]
+            v, h = np.hypot(d[:, 0], d[:, 1])
             
             if h > 0:
-                return v1 / h
+                return float(v / h)
             return 0.0
             
         except Exception as e:
             return 0.0
     
+    def prepare_mesh_input(self, frame):
+        """Downscale a BGR frame and convert it to RGB, reusing preallocated buffers"""
+        small = cv2.resize(frame, self.mesh_input_size, dst=self.mesh_buffer, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
+    
+    def timestamp_iso(self):
+        """Current time as ISO text, cached at one-second resolution"""
+        second = int(time.time())
+        if second != self.iso_second:
+            self.iso_second = second
+            self.iso_text = datetime.fromtimestamp(second).isoformat()
+        return self.iso_text
+    
+    def queue_pc_data(self, data):
+        """Buffer a PC-mode update and emit the batch every emit_interval or emit_batch_size frames"""
+        self.emit_buffer.append(data)
+        now = time.monotonic()
+        if len(self.emit_buffer) >= self.emit_batch_size or now - self.emit_flush_time >= self.emit_interval:
+            emit_from_thread('pc_mode_data_batch', self.emit_buffer)
+            self.emit_buffer = []
+            self.emit_flush_time = now
+    
+    def encode_jpeg(self, frame, quality=75):
+        """Encode a BGR frame as JPEG bytes"""
+        if self.jpeg is not None:
+            return self.jpeg.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+    
+    def begin_frame_send(self):
+        """Claim the in-flight frame slot; False while the previous frame is unacknowledged"""
+        with self.frame_lock:
+            now = time.monotonic()
+            # A disconnected browser never acks, so give up on a frame after a timeout
+            if self.frame_sent_at is not None and now - self.frame_sent_at < self.frame_ack_timeout:
+                return False
+            self.frame_sent_at = now
+            return True
+    
+    def frame_acked(self, *args):
+        """Socket.IO ack callback releasing the in-flight frame slot"""
+        with self.frame_lock:
+            self.frame_sent_at = None
+    
+    def beep_worker(self):
+        """Play queued alert beeps off the detection thread"""
+        while True:
+            self.beep_queue.get()
+            try:
+                winsound.Beep(1000, 500)  # 1000Hz for 500ms
+            except:
+                pass
+    
+    def beep(self):
+        """Request an alert beep without blocking"""
+        try:
+            self.beep_queue.put_nowait(1)
+        except queue.Full:
+            pass
+    
+    def detect_ratios(self, face_mesh, frame, interval=1):
+        """Run MediaPipe on every interval-th frame and return (EAR, MAR), or None without a face"""
+        self.mesh_frame_index += 1
+        if interval > 1 and self.mesh_frame_index % interval:
+            return self.last_ratios
+        
+        results = face_mesh.process(self.prepare_mesh_input(frame))
+        if results.multi_face_landmarks:
+            self.last_ratios = self.calculate_ratios(results.multi_face_landmarks[0])
+        else:
+            self.last_ratios = None
+        return self.last_ratios
+    
+    def calculate_ratios(self, landmarks):
+        """Return (EAR, MAR), using the Numba kernel when available"""
+        if NUMBA_AVAILABLE:
+            try:
+                return ear_mar(gather_ratio_points(landmarks, self.ratio_points))
+            except Exception as e:
+                return 0.3, 0.0
+        return self.calculate_ear(landmarks), self.calculate_mar(landmarks)
+    
     def handle_drowsiness_alert(self, duration):
-        """Handle drowsiness alert"""
-        location = self.get_current_location()
+        """Handle drowsiness alert (network calls are dispatched to the I/O pool)"""
+        # The previous alert is still being delivered; don't pile up more behind it
+        if self.alert_future and not self.alert_future.done():
+            return
+        # Sustained drowsiness crosses the threshold on every frame; alert once per cooldown
+        now = time.monotonic()
+        if self.last_alert_time is not None and now - self.last_alert_time < self.alert_cooldown:
+            return
+        self.last_alert_time = now
+        
+        # Use the last known location and refresh it in the background
+        location = self.current_location
+        if self.location_future is None or self.location_future.done():
+            self.location_future = self.io_pool.submit(self.get_current_location)
         timestamp = datetime.now()
         
         alert_data = {
@@ -222,6 +477,12 @@ class HybridDrowsinessDetector:
         self.stats["session_alerts"] += 1
         self.stats["last_alert"] = timestamp.isoformat()
         
+        self.alert_future = self.io_pool.submit(self.dispatch_alert, alert_data, duration, location)
+        
+        logger.info(f"🚨 Drowsiness alert: {duration:.1f}s at {location['address']}")
+    
+    def dispatch_alert(self, alert_data, duration, location):
+        """Deliver an alert to Telegram, the cloud dashboard and web clients"""
         # Send Telegram alert
         if self.telegram_bot:
             success = self.telegram_bot.send_emergency_alert(duration)
@@ -232,21 +493,20 @@ class HybridDrowsinessDetector:
             try:
                 self.cloud_client.send_alert(duration, location)
             except Exception as e:
-                print(f"⚠️  Cloud alert error: {e}")
+                logger.warning(f"⚠️  Cloud alert error: {e}")
         
         # Emit to web clients
-        socketio.emit('drowsiness_alert', alert_data)
-        
-        print(f"🚨 Drowsiness alert: {duration:.1f}s at {location['address']}")
+        emit_from_thread('drowsiness_alert', alert_data)
     
     def start_pc_mode(self):
         """Start PC mode with OpenCV window"""
         self.mode = "pc"
         self.detection_active = True
+        self.stop_event = threading.Event()
         self.stats["session_start"] = datetime.now()
         
         # Start detection thread
-        detection_thread = threading.Thread(target=self.pc_detection_loop)
+        detection_thread = threading.Thread(target=self.pc_detection_loop, args=(self.stop_event,))
         detection_thread.daemon = True
         detection_thread.start()
         
@@ -257,44 +517,86 @@ class HybridDrowsinessDetector:
         """Start web mode (browser only)"""
         self.mode = "web"
         self.detection_active = True
+        self.stop_event = threading.Event()
         self.stats["session_start"] = datetime.now()
         
         # Start detection thread
-        detection_thread = threading.Thread(target=self.web_detection_loop)
+        detection_thread = threading.Thread(target=self.web_detection_loop, args=(self.stop_event,))
         detection_thread.daemon = True
         detection_thread.start()
         
         print("🌐 Web Mode started - Browser detection")
         return True
     
-    def pc_detection_loop(self):
+    def open_camera(self):
+        """Open the webcam with the native backend and a single-frame buffer"""
+        # DirectShow avoids MSMF's per-read overhead on Windows
+        if sys.platform.startswith('win'):
+            backend = cv2.CAP_DSHOW
+        elif sys.platform.startswith('linux'):
+            backend = cv2.CAP_V4L2
+        else:
+            backend = cv2.CAP_ANY
+        
+        camera = cv2.VideoCapture(0, backend)
+        if not camera.isOpened():
+            camera = cv2.VideoCapture(0)
+        
+        camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
+        camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
+        camera.set(cv2.CAP_PROP_FPS, 30)
+        camera.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        return camera
+    
+    def capture_frames(self, camera, frame_queue, stop_event):
+        """Capture thread: read frames and keep only the latest in frame_queue"""
+        try:
+            while not stop_event.is_set() and camera.isOpened():
+                ret, frame = camera.read()
+                if not ret:
+                    stop_event.wait(0.01)
+                    continue
+                
+                # Drop the unconsumed frame so inference always gets the newest one
+                try:
+                    frame_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                frame_queue.put_nowait(frame)
+        finally:
+            # Released here, never mid-read from another thread (unsafe with DirectShow/V4L2)
+            camera.release()
+    
+    def pc_detection_loop(self, stop_event):
         """High performance PC detection with OpenCV window"""
-        print("🎥 PC Detection loop started - High Performance Mode")
+        logger.info("🎥 PC Detection loop started - High Performance Mode")
         
-        # Initialize camera
-        self.camera = cv2.VideoCapture(0)
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.camera.set(cv2.CAP_PROP_FPS, 30)
+        # Initialize camera; a capture thread keeps only the newest frame for this loop
+        camera = self.open_camera()
+        frame_queue = queue.Queue(maxsize=1)
+        threading.Thread(target=self.capture_frames, args=(camera, frame_queue, stop_event), daemon=True).start()
         
         # Initialize MediaPipe
-        face_mesh = self.mp_face_mesh.FaceMesh(
-            max_num_faces=1,
-            refine_landmarks=True,
-            min_detection_confidence=0.5,
-            min_tracking_confidence=0.5
-        )
+        face_mesh = self.create_face_mesh()
         
         # FPS tracking
         fps_counter = 0
         fps_start_time = time.time()
+        prev_frame_time = time.monotonic()
         
         try:
-            while self.detection_active and self.camera:
-                ret, frame = self.camera.read()
-                if not ret:
+            while not stop_event.is_set():
+                try:
+                    frame = frame_queue.get(timeout=0.1)
+                except queue.Empty:
                     continue
                 
+                # Real elapsed time per frame keeps the sleep timer correct at any FPS
+                # (capped so a stall doesn't count as seconds of closed eyes)
+                now = time.monotonic()
+                dt = min(now - prev_frame_time, self.max_frame_dt)
+                prev_frame_time = now
+                
                 # FPS calculation
                 fps_counter += 1
                 if fps_counter % 30 == 0:
@@ -309,22 +611,18 @@ class HybridDrowsinessDetector:
                 drowsy = False
                 blink_detected = False
                 yawn_detected = False
+                ear = mar = 0.0
                 
-                # Face detection
-                image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                results = face_mesh.process(image_rgb)
+                # Face detection (every pc_mesh_interval-th frame; the rest reuse its ratios)
+                ratios = self.detect_ratios(face_mesh, frame, self.pc_mesh_interval)
                 
-                if results.multi_face_landmarks:
-                    face_landmarks = results.multi_face_landmarks[0]
-                    
-                    # Calculate EAR and MAR
-                    ear = self.calculate_ear(face_landmarks)
-                    mar = self.calculate_mar(face_landmarks)
+                if ratios is not None:
+                    ear, mar = ratios
                     
                     # Eye closure detection
                     if ear < 0.25:
                         self.eyes_closed_frames += 1
-                        self.continuous_sleep_time += 1/30
+                        self.continuous_sleep_time += dt
                         
                         # Only mark as drowsy if eyes have been closed for more than 1 second
                         if self.continuous_sleep_time > 1.0:
@@ -335,12 +633,12 @@ class HybridDrowsinessDetector:
                             blink_detected = True
                             # Only log every 10th blink to reduce spam
                             if self.stats["blink_count"] % 10 == 0:
-                                print(f"👁️ Blinks: {self.stats['blink_count']}")
+                                logger.info(f"👁️ Blinks: {self.stats['blink_count']}")
                     else:
                         if self.eyes_closed_frames > 0 and self.continuous_sleep_time > 1.0:
-                            print(f"👁️ Eyes opened after {self.continuous_sleep_time:.1f}s")
+                            logger.info(f"👁️ Eyes opened after {self.continuous_sleep_time:.1f}s")
                         self.eyes_closed_frames = 0
-                        self.continuous_sleep_time = max(0, self.continuous_sleep_time - 0.05)
+                        self.continuous_sleep_time = max(0, self.continuous_sleep_time - 1.5 * dt)
                     
                     # Yawn detection
                     if mar > 0.6:
@@ -348,7 +646,7 @@ class HybridDrowsinessDetector:
                         if self.yawn_frames == 10:
                             self.stats["yawn_count"] += 1
                             yawn_detected = True
-                            print(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
+                            logger.info(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
                     else:
                         self.yawn_frames = 0
                     
@@ -357,13 +655,10 @@ class HybridDrowsinessDetector:
                 
                 # Handle alerts
                 if self.continuous_sleep_time >= self.config.get('emergency_threshold', 3.0):
-                    print(f"🚨 ALERT! Continuous sleep: {self.continuous_sleep_time:.1f}s")
+                    logger.info(f"🚨 ALERT! Continuous sleep: {self.continuous_sleep_time:.1f}s")
                     self.handle_drowsiness_alert(self.continuous_sleep_time)
                     # Play sound alert
-                    try:
-                        winsound.Beep(1000, 500)  # 1000Hz for 500ms
-                    except:
-                        pass
+                    self.beep()
                 
                 # Show OpenCV window
                 cv2.imshow('Drowsiness Detection - PC Mode', frame)
@@ -379,15 +674,15 @@ class HybridDrowsinessDetector:
                         pass  # Silent fail for stats
                 
                 # Send data to web dashboard
-                socketio.emit('pc_mode_data', {
+                self.queue_pc_data({
                     'drowsy': bool(drowsy),
-                    'continuous_sleep': round(self.continuous_sleep_time, 2),
+                    'continuous_sleep': self.stats["continuous_sleep"],
                     'blink_detected': blink_detected,
                     'yawn_detected': yawn_detected,
                     'fps': self.stats["fps"],
-                    'ear': round(ear, 3) if 'ear' in locals() else 0,
-                    'mar': round(mar, 3) if 'mar' in locals() else 0,
-                    'timestamp': datetime.now().isoformat()
+                    'ear': round(ear, 3),
+                    'mar': round(mar, 3),
+                    'timestamp': self.timestamp_iso()
                 })
                 
                 # Exit on 'q' key
@@ -395,37 +690,45 @@ class HybridDrowsinessDetector:
                     break
                     
         except Exception as e:
-            print(f"❌ PC Detection error: {e}")
+            logger.error(f"❌ PC Detection error: {e}")
         finally:
+            stop_event.set()  # the capture thread releases the camera
             face_mesh.close()
-            if self.camera:
-                self.camera.release()
             cv2.destroyAllWindows()
-            print("🛑 PC Detection ended")
+            logger.info("🛑 PC Detection ended")
     
-    def web_detection_loop(self):
+    def web_detection_loop(self, stop_event):
         """Web-based detection (browser streaming)"""
-        print("🌐 Web Detection loop started")
+        logger.info("🌐 Web Detection loop started")
         
-        # Initialize camera
-        self.camera = cv2.VideoCapture(0)
-        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, 640)
-        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
-        self.camera.set(cv2.CAP_PROP_FPS, 30)
+        # Initialize camera; a capture thread keeps only the newest frame for this loop
+        camera = self.open_camera()
+        frame_queue = queue.Queue(maxsize=1)
+        threading.Thread(target=self.capture_frames, args=(camera, frame_queue, stop_event), daemon=True).start()
+        
+        # Initialize MediaPipe once per session (both backends timestamp frames monotonically)
+        face_mesh = self.create_face_mesh()
         
         # FPS tracking
         fps_counter = 0
         fps_start_time = time.time()
+        prev_frame_time = time.monotonic()
         
         try:
-            while self.detection_active and self.camera:
+            while not stop_event.is_set():
                 loop_start = time.time()
                 
-                ret, frame = self.camera.read()
-                if not ret:
-                    time.sleep(0.01)
+                try:
+                    frame = frame_queue.get(timeout=0.1)
+                except queue.Empty:
                     continue
                 
+                # Real elapsed time per frame keeps the sleep timer correct at any FPS
+                # (capped so a stall doesn't count as seconds of closed eyes)
+                now = time.monotonic()
+                dt = min(now - prev_frame_time, self.max_frame_dt)
+                prev_frame_time = now
+                
                 # FPS calculation
                 fps_counter += 1
                 if fps_counter % 30 == 0:
@@ -442,107 +745,89 @@ class HybridDrowsinessDetector:
                 yawn_detected = False
                 
                 try:
-                    # Create MediaPipe instance for each frame to avoid timestamp issues
-                    with self.mp_face_mesh.FaceMesh(
-                        max_num_faces=1,
-                        refine_landmarks=True,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5
-                    ) as face_mesh:
-                        
-                        # Face detection
-                        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        results = face_mesh.process(image_rgb)
+                    # Face detection (every frame: web mode is already paced to 15 FPS)
+                    ratios = self.detect_ratios(face_mesh, frame)
 
-                        if results.multi_face_landmarks:
-                            face_landmarks = results.multi_face_landmarks[0]
-                            
-                            # Calculate EAR and MAR
-                            ear = self.calculate_ear(face_landmarks)
-                            mar = self.calculate_mar(face_landmarks)
+                    if ratios is not None:
+                        ear, mar = ratios
+                        
+                        # Eye closure detection
+                        if ear < 0.25:
+                            self.eyes_closed_frames += 1
+                            self.continuous_sleep_time += dt
                             
-                            # Eye closure detection
-                            if ear < 0.25:
-                                self.eyes_closed_frames += 1
-                                self.continuous_sleep_time += 1/30
-                                
-                                # Only mark as drowsy if eyes have been closed for more than 1 second
-                                if self.continuous_sleep_time > 1.0:
-                                    drowsy = True
-                                
-                                if self.eyes_closed_frames == 3:
-                                    self.stats["blink_count"] += 1
-                                    blink_detected = True
-                                    # Only log every 10th blink to reduce spam
-                                    if self.stats["blink_count"] % 10 == 0:
-                                        print(f"👁️ Blinks: {self.stats['blink_count']}")
-                            else:
-                                if self.eyes_closed_frames > 0 and self.continuous_sleep_time > 1.0:
-                                    print(f"👁️ Eyes opened after {self.continuous_sleep_time:.1f}s")
-                                self.eyes_closed_frames = 0
-                                self.continuous_sleep_time = max(0, self.continuous_sleep_time - 0.05)
+                            # Only mark as drowsy if eyes have been closed for more than 1 second
+                            if self.continuous_sleep_time > 1.0:
+                                drowsy = True
                             
-                            # Yawn detection
-                            if mar > 0.6:
-                                self.yawn_frames += 1
-                                if self.yawn_frames == 10:
-                                    self.stats["yawn_count"] += 1
-                                    yawn_detected = True
-                                    print(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
-                            else:
-                                self.yawn_frames = 0
+                            if self.eyes_closed_frames == 3:
+                                self.stats["blink_count"] += 1
+                                blink_detected = True
+                                # Only log every 10th blink to reduce spam
+                                if self.stats["blink_count"] % 10 == 0:
+                                    logger.info(f"👁️ Blinks: {self.stats['blink_count']}")
+                        else:
+                            if self.eyes_closed_frames > 0 and self.continuous_sleep_time > 1.0:
+                                logger.info(f"👁️ Eyes opened after {self.continuous_sleep_time:.1f}s")
+                            self.eyes_closed_frames = 0
+                            self.continuous_sleep_time = max(0, self.continuous_sleep_time - 1.5 * dt)
+                        
+                        # Yawn detection
+                        if mar > 0.6:
+                            self.yawn_frames += 1
+                            if self.yawn_frames == 10:
+                                self.stats["yawn_count"] += 1
+                                yawn_detected = True
+                                logger.info(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
+                        else:
+                            self.yawn_frames = 0
 
                 except Exception as e:
-                    print(f"⚠️ Web detection error: {e}")
+                    logger.warning(f"⚠️ Web detection error: {e}")
                 
                 # Update stats
                 self.stats["continuous_sleep"] = round(self.continuous_sleep_time, 2)
                 
                 # Handle drowsiness alert
                 if self.continuous_sleep_time >= self.config.get('emergency_threshold', 3.0):
-                    print(f"🚨 ALERT! Continuous sleep: {self.continuous_sleep_time:.1f}s")
+                    logger.info(f"🚨 ALERT! Continuous sleep: {self.continuous_sleep_time:.1f}s")
                     self.handle_drowsiness_alert(self.continuous_sleep_time)
                 
-                # Encode frame for streaming
-                import base64
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
-                _, buffer = cv2.imencode('.jpg', frame, encode_params)
-                frame_data = base64.b64encode(buffer).decode('utf-8')
-                
-                # Emit frame with detection data
-                socketio.emit('web_mode_data', {
-                    'frame': frame_data,
-                    'drowsy': bool(drowsy),
-                    'continuous_sleep': round(self.continuous_sleep_time, 2),
-                    'blink_detected': blink_detected,
-                    'yawn_detected': yawn_detected,
-                    'fps': self.stats["fps"],
-                    'timestamp': datetime.now().isoformat()
-                })
+                # Latest frame wins: skip encoding while the browser hasn't acknowledged the last one
+                if self.begin_frame_send():
+                    # Encode frame for streaming (sent as a binary attachment, no base64)
+                    frame_data = self.encode_jpeg(frame)
+                    
+                    # Emit frame with detection data
+                    emit_from_thread('web_mode_data', {
+                        'frame': frame_data,
+                        'drowsy': bool(drowsy),
+                        'continuous_sleep': self.stats["continuous_sleep"],
+                        'blink_detected': blink_detected,
+                        'yawn_detected': yawn_detected,
+                        'fps': self.stats["fps"],
+                        'timestamp': self.timestamp_iso()
+                    }, callback=self.frame_acked)
                 
                 # Maintain target FPS (limit to ~15 FPS for web mode)
                 loop_time = time.time() - loop_start
                 target_time = 0.067  # ~15 FPS
                 if loop_time < target_time:
-                    time.sleep(target_time - loop_time)
+                    stop_event.wait(target_time - loop_time)
                 
         except Exception as e:
-            print(f"❌ Web detection error: {e}")
+            logger.error(f"❌ Web detection error: {e}")
         finally:
-            if self.camera:
-                self.camera.release()
-            print("🛑 Web detection ended")
+            stop_event.set()  # the capture thread releases the camera
+            face_mesh.close()
+            logger.info("🛑 Web detection ended")
     
     def stop_detection(self):
         """Stop detection"""
         print("🛑 Stopping detection...")
         self.detection_active = False
-        
-        if self.camera:
-            self.camera.release()
-            self.camera = None
-        
-        cv2.destroyAllWindows()
+        # The session's own threads release the camera and close the window when they see the event
+        self.stop_event.set()
         print("✅ Detection stopped")
 
 # Global detector instance
@@ -673,7 +958,7 @@ def get_telegram_updates():
     
     try:
         url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
-        response = requests.get(url, timeout=10)
+        response = detector.http.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
@@ -705,4 +990,6 @@ if __name__ == '__main__':
     print("🚀 Starting Hybrid Drowsiness Detection System...")
     print("📱 Access the dashboard at: http://localhost:5000")
     print("🎯 Choose between PC Mode (high performance) or Web Mode")
-    socketio.run(app, host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
+    # The reloader would fork and re-run MediaPipe/camera setup; opt into debug with FLASK_DEBUG=1
+    debug = os.getenv('FLASK_DEBUG') == '1'
+    socketio.run(app, host='0.0.0.0', port=5000, debug=debug, use_reloader=False)
\ No newline at end of file
@@ -4,15 +4,34 @@ Local Client - Runs on user's computer
 Sends data to cloud dashboard while running detection locally
 """
 
+import functools
+import orjson
 import requests
 import threading
 import time
-import json
 import uuid
 import socket
 import hashlib
 import os
-from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+
+UNKNOWN_LOCATION = {"lat": 0, "lng": 0, "address": "Unknown"}
+
+# (connect, read) timeouts: a short connect fails fast on a dead endpoint,
+# the read part tolerates a briefly slow server
+HEARTBEAT_TIMEOUT = (2.0, 3.0)  # a heartbeat slower than this is stale anyway
+ALERT_TIMEOUT = (2.0, 5.0)
+REGISTER_TIMEOUT = (3.0, 10.0)
+
+@functools.lru_cache(maxsize=1)
+def compute_device_id():
+    """Unique device ID derived from the MAC address (computed once per process)"""
+    # Keep the original derivation byte-for-byte so already registered devices keep their IDs
+    mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
+                   for elements in range(0,2*6,2)][::-1])
+    return hashlib.sha256(mac.encode()).hexdigest()
 
 class CloudClient:
     def __init__(self, cloud_url, api_key, device_name=None):
@@ -25,37 +44,103 @@ class CloudClient:
             device_name: Optional device name
         """
         self.cloud_url = cloud_url.rstrip('/')
+        self.register_url = f"{self.cloud_url}/api/device/register"
+        self.heartbeat_url = f"{self.cloud_url}/api/device/heartbeat"
+        self.alert_url = f"{self.cloud_url}/api/device/alert"
+        self.stats_batch_url = f"{self.cloud_url}/api/device/stats/batch"
         self.api_key = api_key
         self.device_id = self.get_device_id()
         self.device_name = device_name or f"{socket.gethostname()}-{self.device_id[:8]}"
         self.connected = False
         self.heartbeat_interval = 30  # seconds
         self.stats_interval = 5  # seconds
+        self.stats_buffer = deque(maxlen=256)  # Snapshots waiting for the next batched upload
+        
+        # Request bodies are serialized with orjson; the device_id prefix is built once
+        self.json_headers = {'Content-Type': 'application/json'}
+        self.body_prefix = orjson.dumps({"device_id": self.device_id})[:-1] + b','
+        self.heartbeat_body = orjson.dumps({"device_id": self.device_id})
+        
+        # Transient failures (429/5xx, connection errors) retry with exponential backoff
+        self.max_retries = 3
+        self.backoff_factor = 0.5  # 0.5s, 1s, 2s
+        self.retry_statuses = {429, 500, 502, 503, 504}
+        
+        # Circuit breaker: after 3 consecutive failed requests, alerts and stats
+        # short-circuit for 30s instead of waiting on a dead endpoint
+        self.breaker_threshold = 3
+        self.breaker_cooldown = 30  # seconds
+        self.failures = 0
+        self.opened_at = 0
+        
+        # Keep-alive session; non-blocking alerts are posted from a small native-thread pool,
+        # which also works when hybrid_detector has eventlet-patched the process
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        self.io_pool = ThreadPoolExecutor(max_workers=4)
         
         # Register device
         self.register_device()
         
         # Start background threads
         self.start_heartbeat()
+        threading.Thread(target=self.flush_stats_loop, daemon=True).start()
     
     def get_device_id(self):
         """Generate unique device ID"""
-        # Use MAC address for consistent ID
-        mac = ':'.join(['{:02x}'.format((uuid.getnode() >> elements) & 0xff)
-                       for elements in range(0,2*6,2)][::-1])
-        return hashlib.sha256(mac.encode()).hexdigest()
+        return compute_device_id()
+    
+    def circuit_open(self):
+        """True while the breaker is open (cloud recently failed repeatedly)"""
+        return bool(self.opened_at) and time.monotonic() - self.opened_at < self.breaker_cooldown
+    
+    def record_result(self, ok):
+        """Update the breaker with the outcome of one request"""
+        if ok:
+            self.failures = 0
+            self.opened_at = 0
+            return
+        self.failures += 1
+        if self.failures >= self.breaker_threshold:
+            if not self.circuit_open():
+                print(f"⚠️  Cloud unreachable - pausing uploads for {self.breaker_cooldown}s")
+            self.opened_at = time.monotonic()
+    
+    def post(self, url, body, timeout=ALERT_TIMEOUT):
+        """POST a pre-serialized JSON body to the cloud, retrying transient failures with backoff"""
+        for attempt in range(self.max_retries + 1):
+            delay = self.backoff_factor * (2 ** attempt)
+            try:
+                response = self.http.post(url, data=body, headers=self.json_headers, timeout=timeout)
+                if response.status_code not in self.retry_statuses or attempt == self.max_retries:
+                    self.record_result(response.status_code not in self.retry_statuses)
+                    return response
+                retry_after = response.headers.get('Retry-After')
+                if retry_after and retry_after.isdigit():
+                    delay = int(retry_after)
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    self.record_result(False)
+                    raise
+            time.sleep(delay)
+    
+    def device_body(self, fields):
+        """JSON body of {"device_id": ..., **fields} using the prebuilt prefix"""
+        return self.body_prefix + orjson.dumps(fields)[1:]
     
     def register_device(self):
         """Register device with cloud"""
         try:
-            response = requests.post(
-                f"{self.cloud_url}/api/device/register",
-                json={
+            response = self.post(
+                self.register_url,
+                orjson.dumps({
                     "device_id": self.device_id,
                     "device_name": self.device_name,
                     "api_key": self.api_key
-                },
-                timeout=10
+                }),
+                timeout=REGISTER_TIMEOUT
             )
             
             if response.status_code == 200:
@@ -74,11 +159,7 @@ class CloudClient:
         while True:
             try:
                 if self.connected:
-                    response = requests.post(
-                        f"{self.cloud_url}/api/device/heartbeat",
-                        json={"device_id": self.device_id},
-                        timeout=5
-                    )
+                    response = self.post(self.heartbeat_url, self.heartbeat_body, timeout=HEARTBEAT_TIMEOUT)
                     
                     if response.status_code != 200:
                         print(f"⚠️  Heartbeat failed: {response.status_code}")
@@ -93,24 +174,16 @@ class CloudClient:
         thread = threading.Thread(target=self.send_heartbeat, daemon=True)
         thread.start()
     
-    def send_alert(self, duration, location=None):
+    def post_alert(self, duration, location=None):
         """Send drowsiness alert to cloud"""
-        if not self.connected:
-            return False
-        
         try:
-            alert_data = {
-                "device_id": self.device_id,
-                "timestamp": datetime.now().isoformat(),
+            body = self.device_body({
+                "timestamp": int(time.time() * 1000),  # epoch ms, formatted server-side
                 "duration": duration,
-                "location": location or {"lat": 0, "lng": 0, "address": "Unknown"}
-            }
+                "location": location or UNKNOWN_LOCATION
+            })
             
-            response = requests.post(
-                f"{self.cloud_url}/api/device/alert",
-                json=alert_data,
-                timeout=5
-            )
+            response = self.post(self.alert_url, body)
             
             if response.status_code == 200:
                 print(f"📤 Alert sent to cloud: {duration:.1f}s")
@@ -123,34 +196,54 @@ class CloudClient:
             print(f"❌ Alert error: {e}")
             return False
     
-    def send_stats(self, stats, location=None):
-        """Send statistics to cloud"""
-        if not self.connected:
+    def send_alert(self, duration, location=None, wait=True):
+        """Send drowsiness alert to cloud (wait=False posts from the I/O pool and returns immediately)"""
+        if not self.connected or self.circuit_open():
             return False
         
+        if not wait:
+            self.io_pool.submit(self.post_alert, duration, location)
+            return True
+        return self.post_alert(duration, location)
+    
+    def post_stats_batch(self, batch):
+        """Send buffered statistics snapshots to cloud in one request"""
         try:
-            stats_data = {
-                "device_id": self.device_id,
-                "stats": stats,
-                "location": location or {"lat": 0, "lng": 0, "address": "Unknown"}
-            }
-            
-            response = requests.post(
-                f"{self.cloud_url}/api/device/stats",
-                json=stats_data,
-                timeout=5
-            )
+            response = self.post(self.stats_batch_url, self.device_body({"batch": batch}))
             
             return response.status_code == 200
                 
         except Exception as e:
             # Silent fail for stats (non-critical)
             return False
+    
+    def flush_stats_loop(self):
+        """Periodically post all buffered statistics"""
+        while True:
+            time.sleep(self.stats_interval)
+            if not self.connected or not self.stats_buffer or self.circuit_open():
+                continue
+            
+            batch = []
+            while self.stats_buffer:
+                batch.append(self.stats_buffer.popleft())
+            self.post_stats_batch(batch)
+    
+    def send_stats(self, stats, location=None):
+        """Queue statistics for the next batched upload"""
+        if not self.connected:
+            return False
+        
+        self.stats_buffer.append({
+            "timestamp": time.time(),
+            "stats": dict(stats),
+            "location": location or UNKNOWN_LOCATION
+        })
+        return True
 
-import hashlib
-
-def load_cloud_config():
-    """Load cloud configuration"""
+@functools.lru_cache(maxsize=1)
+def read_cloud_config():
+    """Parse cloud_config.json once per process; callers go through load_cloud_config"""
     config_file = 'cloud_config.json'
     default_config = {
         "cloud_url": "http://localhost:5000",
@@ -161,18 +254,18 @@ def load_cloud_config():
     
     if os.path.exists(config_file):
         try:
-            with open(config_file, 'r') as f:
-                config = json.load(f)
-                for key, value in default_config.items():
-                    if key not in config:
-                        config[key] = value
-                return config
-        except:
+            with open(config_file, 'rb') as f:
+                config = orjson.loads(f.read())
+            if isinstance(config, dict):
+                return default_config | config
+        except (OSError, orjson.JSONDecodeError):
             pass
     
     return default_config
 
-import os
+def load_cloud_config():
+    """Load cloud configuration (file read once per process; each caller gets its own copy)"""
+    return dict(read_cloud_config())
 
 # Example usage
 if __name__ == '__main__':
@@ -201,10 +294,10 @@ if __name__ == '__main__':
         
         print("✅ Test complete - check cloud dashboard")
         
-        # Keep alive
+        # Keep alive until Ctrl-C without waking up periodically
+        stop_event = threading.Event()
         try:
-            while True:
-                time.sleep(1)
+            stop_event.wait()
         except KeyboardInterrupt:
             print("\n👋 Shutting down...")
     else:
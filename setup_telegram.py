@@ -3,17 +3,46 @@
 Simple Telegram Bot Setup for Drowsiness Detection
 """
 
+import asyncio
 import json
+import httpx
 import requests
+from requests.adapters import HTTPAdapter
+import getpass
 import os
+import time
 
-def test_bot_token(token):
-    """Test if bot token is valid"""
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# One keep-alive session for every call to api.telegram.org
+TG_SESSION = requests.Session()
+TG_SESSION.mount('https://', HTTPAdapter(pool_maxsize=10))
+
+# The bot token is never stored in source: set TG_BOT_TOKEN or enter it when prompted
+BOT_TOKEN = os.environ.get("TG_BOT_TOKEN", "").strip()
+TG_API = "https://api.telegram.org/bot"
+
+LONG_POLL_TIMEOUT = 25  # seconds Telegram holds getUpdates open waiting for a message
+MAX_RECIPIENT_WAIT = 75  # total seconds to wait for recipients to message the bot
+TG_TIMEOUT = (2, 10)  # (connect, read) seconds
+
+def parse_json(response):
+    """Decode a Telegram API response body (orjson when available)"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(response.content)
+    return response.json()
+
+def test_bot_token(base, session=TG_SESSION):
+    """Test if bot token is valid (base is TG_API + token)"""
     try:
-        url = f"https://api.telegram.org/bot{token}/getMe"
-        response = requests.get(url, timeout=10)
+        url = f"{base}/getMe"
+        response = session.get(url, timeout=TG_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data.get('ok'):
                 bot_info = data.get('result', {})
                 return True, bot_info.get('username', 'Unknown')
@@ -21,13 +50,17 @@ def test_bot_token(token):
     except Exception as e:
         return False, str(e)
 
-def get_chat_id(token):
-    """Get recent chat IDs"""
+def get_chat_id(base, session=TG_SESSION, long_poll=False):
+    """Get recent chat IDs (long_poll waits up to LONG_POLL_TIMEOUT for a message to arrive); None on error"""
     try:
-        url = f"https://api.telegram.org/bot{token}/getUpdates"
-        response = requests.get(url, timeout=10)
+        url = f"{base}/getUpdates"
+        if long_poll:
+            params = {'timeout': LONG_POLL_TIMEOUT, 'allowed_updates': '["message"]'}
+            response = session.get(url, params=params, timeout=(TG_TIMEOUT[0], LONG_POLL_TIMEOUT + 5))
+        else:
+            response = session.get(url, timeout=TG_TIMEOUT)
         if response.status_code == 200:
-            data = response.json()
+            data = parse_json(response)
             if data.get('ok'):
                 updates = data.get('result', [])
                 chat_ids = []
@@ -40,21 +73,58 @@ def get_chat_id(token):
                             'name': chat.get('first_name', chat.get('title', 'Unknown'))
                         })
                 return chat_ids
-        return []
+        print(f"Error getting chat IDs: HTTP {response.status_code}")
+        return None
     except Exception as e:
         print(f"Error getting chat IDs: {e}")
-        return []
+        return None
+
+TEST_MESSAGE = (
+    "🧪 <b>Test Alert</b>\n\n"
+    "✅ Your Telegram bot is configured correctly!\n"
+    "🚗 Drowsiness detection alerts are now active."
+)
+
+async def _send_test(client, url, chat_id, message):
+    """Send the setup test message to one chat; returns True on success"""
+    try:
+        data = {
+            'chat_id': chat_id,
+            'text': message,
+            'parse_mode': 'HTML'
+        }
+        response = await client.post(url, data=data)
+        
+        if response.status_code == 200:
+            return True
+        print(f"❌ Test failed for chat ID: {chat_id}")
+            
+    except Exception as e:
+        print(f"❌ Test failed for chat ID {chat_id}: {e}")
+    return False
+
+async def _send_all(chats, base):
+    """Send the test message to every chat concurrently; returns the success count"""
+    url = f"{base}/sendMessage"
+    async with httpx.AsyncClient(limits=httpx.Limits(max_connections=10),
+                                 timeout=httpx.Timeout(TG_TIMEOUT[1], connect=TG_TIMEOUT[0])) as client:
+        results = await asyncio.gather(*[_send_test(client, url, c, TEST_MESSAGE) for c in chats],
+                                       return_exceptions=True)
+    return sum(r is True for r in results)
 
 def main():
     print("🤖 Telegram Bot Setup for Drowsiness Detection")
     print("=" * 50)
     
-    # Use the configured bot token
-    bot_token = "8403007470:AAGtV8866_V1v3pZHAVXpVxz0fjFY2CPCxs"
+    print("\n1️⃣ Bot Token")
+    bot_token = BOT_TOKEN or getpass.getpass("Enter your bot token from @BotFather (or set TG_BOT_TOKEN): ").strip()
+    if not bot_token:
+        print("❌ No bot token provided!")
+        return
+    tg_base = f"{TG_API}{bot_token}"
     
-    print("\n1️⃣ Using Configured Bot")
     print("🔍 Testing bot connection...")
-    valid, info = test_bot_token(bot_token)
+    valid, info = test_bot_token(tg_base)
     
     if valid:
         print(f"✅ Bot connected successfully!")
@@ -72,21 +142,26 @@ def main():
     print("   • Send ANY message to the bot (like 'hello' or '/start')")
     print("   • Then we can detect their chat ID")
     
-    # Start with your configured chat ID
-    selected_chats = ["1569080701"]  # Your chat ID
-    print(f"\n✅ Your chat ID ({selected_chats[0]}) is already configured")
-    print("   This is from your bot creation details")
-    
-    add_more = input("\nDo you want to add more recipients? (y/n): ").lower()
+    # Start with any chat IDs given in TG_CHAT_IDS (comma separated)
+    selected_chats = [c.strip() for c in os.environ.get("TG_CHAT_IDS", "").split(",") if c.strip()]
+    if selected_chats:
+        print(f"\n✅ {len(selected_chats)} chat ID(s) loaded from TG_CHAT_IDS")
+        add_more = input("\nDo you want to add more recipients? (y/n): ").lower()
+    else:
+        add_more = 'y'
     
     if add_more == 'y' or not selected_chats:
         if not selected_chats:
             print("\nNo existing recipients found. Let's add some!")
         
-        input("\nMake sure all recipients have messaged your bot, then press Enter...")
-        
-        print("🔍 Looking for recent messages...")
-        chat_ids = get_chat_id(bot_token)
+        print(f"\n🔍 Waiting up to {MAX_RECIPIENT_WAIT}s for recipients to message your bot...")
+        chat_ids = []
+        deadline = time.monotonic() + MAX_RECIPIENT_WAIT
+        while not chat_ids and time.monotonic() < deadline:
+            # An empty list means the long poll ran to its timeout; stop on errors (bad token, webhook set...)
+            chat_ids = get_chat_id(tg_base, long_poll=True)
+            if chat_ids is None:
+                break
         
         if not chat_ids:
             print("❌ No recent messages found!")
@@ -160,29 +235,8 @@ def main():
     # Test alert
     test = input("\n🧪 Send test alert to all recipients? (y/n): ").lower()
     if test == 'y':
-        success_count = 0
-        for chat_id in selected_chats:
-            try:
-                url = f"https://api.telegram.org/bot{bot_token}/sendMessage"
-                message = (
-                    "🧪 <b>Test Alert</b>\n\n"
-                    "✅ Your Telegram bot is configured correctly!\n"
-                    "🚗 Drowsiness detection alerts are now active."
-                )
-                data = {
-                    'chat_id': chat_id,
-                    'text': message,
-                    'parse_mode': 'HTML'
-                }
-                response = requests.post(url, data=data, timeout=10)
-                
-                if response.status_code == 200:
-                    success_count += 1
-                else:
-                    print(f"❌ Test failed for chat ID: {chat_id}")
-                    
-            except Exception as e:
-                print(f"❌ Test failed for chat ID {chat_id}: {e}")
+        # All recipients in flight at once on one event loop
+        success_count = asyncio.run(_send_all(selected_chats, tg_base))
         
         print(f"✅ Test alerts sent to {success_count}/{len(selected_chats)} recipients!")
     
@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+orjson codec for Flask-SocketIO shared by the web apps
+"""
+
+import orjson
+
+
+class OrjsonCodec:
+    """json-module stand-in so Socket.IO packets are encoded with orjson"""
+    @staticmethod
+    def dumps(obj, **kwargs):
+        return orjson.dumps(obj).decode()
+    
+    @staticmethod
+    def loads(s, **kwargs):
+        return orjson.loads(s)
@@ -3,53 +3,84 @@
 Test script to verify which interface is being served
 """
 
+import re
 import requests
 import time
 
+ALL_MARKERS = (
+    "Choose Detection Mode",
+    "PC Mode (Recommended)",
+    "Web Mode",
+    "startPCMode()",
+    "startWebMode()",
+    "Drowsiness Detection Dashboard",
+    "/admin",
+)
+# One pass over the page finds every marker
+TEST_PATTERNS = re.compile("|".join(map(re.escape, ALL_MARKERS)))
+MARKER_OVERLAP = max(map(len, ALL_MARKERS)) - 1
+
+def scan_markers(response):
+    """Stream the body through TEST_PATTERNS, stopping once every marker is found"""
+    found = set()
+    scanned = 0
+    tail = ""
+    for chunk in response.iter_content(chunk_size=4096, decode_unicode=True):
+        # Keep the end of the previous chunk so markers can straddle boundaries
+        window = tail + chunk
+        found.update(TEST_PATTERNS.findall(window))
+        scanned += len(chunk)
+        if len(found) == len(ALL_MARKERS):
+            break
+        tail = window[-MARKER_OVERLAP:]
+    return found, scanned
+
 def test_interface():
     try:
         print("🧪 Testing interface at http://localhost:5000...")
         
-        response = requests.get('http://localhost:5000', timeout=5)
+        with requests.get('http://localhost:5000', stream=True, timeout=(2, 5)) as response:
+            if response.status_code == 200:
+                if response.encoding is None:
+                    response.encoding = 'utf-8'
+                found, scanned = scan_markers(response)
         
         if response.status_code == 200:
-            content = response.text
-            
             print(f"✅ Server is running (Status: {response.status_code})")
-            print(f"📄 Content length: {len(content)} characters")
+            print(f"📄 Content scanned: {scanned} characters")
             
             # Check for hybrid interface elements
-            if "Choose Detection Mode" in content:
+            if "Choose Detection Mode" in found:
                 print("✅ Hybrid interface detected!")
                 
-                if "PC Mode (Recommended)" in content:
+                if "PC Mode (Recommended)" in found:
                     print("✅ PC Mode option found")
                 else:
                     print("❌ PC Mode option missing")
                     
-                if "Web Mode" in content:
+                if "Web Mode" in found:
                     print("✅ Web Mode option found")
                 else:
                     print("❌ Web Mode option missing")
                     
-                if "startPCMode()" in content:
+                if "startPCMode()" in found:
                     print("✅ PC Mode JavaScript function found")
                 else:
                     print("❌ PC Mode JavaScript function missing")
                     
-                if "startWebMode()" in content:
+                if "startWebMode()" in found:
                     print("✅ Web Mode JavaScript function found")
                 else:
                     print("❌ Web Mode JavaScript function missing")
                     
-            elif "Drowsiness Detection Dashboard" in content:
+            elif "Drowsiness Detection Dashboard" in found:
                 print("⚠️ Regular web app interface detected (not hybrid)")
                 
             else:
                 print("❓ Unknown interface type")
                 
             # Check admin link
-            if "/admin" in content:
+            if "/admin" in found:
                 print("✅ Admin panel link found")
             else:
                 print("❌ Admin panel link missing")
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script to verify CloudClient works inside an eventlet-patched process
+(the way hybrid_detector.py imports it)
+"""
+
+import json
+import os
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Runs in a child process so monkey_patch can't leak into this one
+PATCHED_CLIENT = """
+import eventlet
+eventlet.monkey_patch(thread=False)  # same patching as hybrid_detector.py
+import sys
+from local_client import CloudClient
+
+client = CloudClient(sys.argv[1], 'test_key', device_name='eventlet-test')
+assert client.connected, "registration failed"
+assert client.send_alert(1.5, wait=True), "alert not delivered"
+print("ok")
+"""
+
+class RecordingHandler(BaseHTTPRequestHandler):
+    """Answers every POST with {"success": true} and records the path"""
+    paths = []
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        self.paths.append(self.path)
+        body = json.dumps({"success": True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+def test_cloud_client_under_eventlet():
+    try:
+        import eventlet, orjson, requests  # noqa: F401
+    except ImportError as e:
+        print(f"⚠️ Skipped: {e}")
+        return
+
+    server = HTTPServer(('127.0.0.1', 0), RecordingHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        url = f"http://127.0.0.1:{server.server_port}"
+        print(f"🧪 Testing CloudClient under eventlet.monkey_patch against {url}...")
+        result = subprocess.run([sys.executable, '-c', PATCHED_CLIENT, url],
+                                cwd=HERE, capture_output=True, text=True, timeout=60)
+    finally:
+        server.shutdown()
+
+    assert result.returncode == 0, result.stdout + result.stderr
+    assert '/api/device/register' in RecordingHandler.paths, RecordingHandler.paths
+    assert '/api/device/alert' in RecordingHandler.paths, RecordingHandler.paths
+    print("✅ Registration and alert delivered from the patched process")
+
+if __name__ == "__main__":
+    test_cloud_client_under_eventlet()
@@ -7,22 +7,86 @@ Real-time monitoring with admin controls and Google Maps integration
 from flask import Flask, render_template, request, jsonify, redirect, url_for, session
 from flask_socketio import SocketIO, emit
 import cv2
-import base64
 import threading
 import time
 import json
 import os
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from types import SimpleNamespace
 import queue
 from DrowsinessDetector_Universal import TelegramBot
 import numpy as np
+import torch
 from ultralytics import YOLO
 import mediapipe as mp
+from detector_kernels import NUMBA_AVAILABLE, RATIO_IDX, gather_ratio_points
+from socketio_json import OrjsonCodec
+if NUMBA_AVAILABLE:
+    from detector_kernels import ear_mar
+
+# Optional libjpeg-turbo encoder for video streaming
+try:
+    from turbojpeg import TurboJPEG, TJSAMP_420
+    TURBOJPEG_AVAILABLE = True
+except ImportError:
+    TURBOJPEG_AVAILABLE = False
+
+# MediaPipe Tasks FaceLandmarker (VIDEO mode) is used when its model bundle is present
+FACE_LANDMARKER_MODEL = 'face_landmarker.task'
+try:
+    from mediapipe.tasks import python as mp_tasks
+    from mediapipe.tasks.python import vision as mp_vision
+    MP_TASKS_AVAILABLE = True
+except ImportError:
+    MP_TASKS_AVAILABLE = False
+
+class VideoFaceLandmarker:
+    """FaceLandmarker in VIDEO mode behind the legacy FaceMesh process()/close() interface"""
+    def __init__(self, model_path):
+        options = mp_vision.FaceLandmarkerOptions(
+            base_options=mp_tasks.BaseOptions(model_asset_path=model_path),
+            running_mode=mp_vision.RunningMode.VIDEO,
+            num_faces=1,
+            min_face_detection_confidence=0.5,
+            min_tracking_confidence=0.3,
+            output_face_blendshapes=False
+        )
+        self.landmarker = mp_vision.FaceLandmarker.create_from_options(options)
+        self.start_time = time.monotonic()
+        self.last_timestamp = -1
+    
+    def process(self, image_rgb):
+        """Run the landmarker; results mimic FaceMesh's multi_face_landmarks"""
+        # VIDEO mode requires strictly increasing timestamps
+        timestamp = max(int((time.monotonic() - self.start_time) * 1000), self.last_timestamp + 1)
+        self.last_timestamp = timestamp
+        image = mp.Image(image_format=mp.ImageFormat.SRGB, data=image_rgb)
+        result = self.landmarker.detect_for_video(image, timestamp)
+        faces = [SimpleNamespace(landmark=landmarks) for landmarks in result.face_landmarks]
+        return SimpleNamespace(multi_face_landmarks=faces or None)
+    
+    def close(self):
+        self.landmarker.close()
 
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'drowsiness_detection_2024'
-socketio = SocketIO(app, cors_allowed_origins="*")
+socketio = SocketIO(app, cors_allowed_origins="*", json=OrjsonCodec)
+
+LOCATION_CACHE_FILE = 'location_cache.json'
+
+# Row pairs within the RATIO_IDX points: per eye (v1, v2, h), then mouth vertical/horizontal
+EAR_ROWS_A = np.array([1, 2, 0, 7, 8, 6])
+EAR_ROWS_B = np.array([5, 4, 3, 11, 10, 9])
+MAR_ROWS_A = np.array([12, 14])
+MAR_ROWS_B = np.array([13, 15])
+
+# Fallback landmark endpoints: first half pairs with second half.
+# Eyes: left (v1, v2, h) then right (v1, v2, h); mouth: (v1, v2, h)
+FALLBACK_EAR_IDX = (7, 163, 33, 382, 381, 362, 153, 145, 144, 373, 374, 380)
+FALLBACK_MAR_IDX = (17, 314, 61, 307, 375, 84)
 
 class WebDrowsinessDetector:
     def __init__(self):
@@ -32,6 +96,22 @@ class WebDrowsinessDetector:
         self.config = self.load_config()
         self.alert_queue = queue.Queue()
         self.current_location = {"lat": 0, "lng": 0, "address": "Unknown"}
+        self.location_cache_time = None  # epoch seconds of the last successful lookup
+        self.location_ttl = 86400  # seconds; the host's public IP rarely moves within a day
+        
+        # Keep-alive HTTP session for location and Telegram API calls
+        self.http = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=4)
+        self.http.mount('http://', adapter)
+        self.http.mount('https://', adapter)
+        
+        # Network I/O for alerts runs off the detection thread
+        self.io_pool = ThreadPoolExecutor(max_workers=4)
+        self.alert_future = None
+        self.location_future = None
+        self.alert_cooldown = 10  # seconds between alerts while the driver stays over the threshold
+        self.last_alert_time = None
+        self.load_location_cache()
         
         # Enhanced statistics with detailed metrics
         self.stats = {
@@ -60,15 +140,47 @@ class WebDrowsinessDetector:
         self.yawn_counter = 0
         self.ear_values = []
         self.mar_values = []
+        self.ratio_points = np.empty((len(RATIO_IDX), 2), dtype=np.float32)  # Reused landmark gather buffer
+        
+        # Face mesh runs on a downscaled copy; EAR/MAR use normalized landmarks so no rescale is needed
+        self.mesh_input_size = (320, 240)
+        self.mesh_buffer = np.empty((self.mesh_input_size[1], self.mesh_input_size[0], 3), np.uint8)
+        self.rgb_buffer = np.empty_like(self.mesh_buffer)  # Reused BGR->RGB destination
+        
+        # With a CUDA-enabled OpenCV build, resize + convert run on the GPU into reused device buffers
+        self.gpu_frame = None
+        try:
+            if cv2.cuda.getCudaEnabledDeviceCount() > 0:
+                self.gpu_frame = cv2.cuda_GpuMat()
+                self.gpu_small = cv2.cuda_GpuMat()
+                self.gpu_rgb = cv2.cuda_GpuMat()
+                print("✅ OpenCV CUDA preprocessing enabled")
+        except (AttributeError, cv2.error):
+            self.gpu_frame = None
         
         # Performance tracking
         self.last_fps_time = time.time()
         self.frame_count = 0
         
+        # SIMD JPEG encoder for the video stream (OpenCV's encoder when unavailable)
+        self.jpeg = None
+        if TURBOJPEG_AVAILABLE:
+            try:
+                self.jpeg = TurboJPEG()
+            except Exception as e:
+                print(f"⚠️ TurboJPEG unavailable, using OpenCV encoder: {e}")
+        
+        # Frames waiting for JPEG encode + emit; small so a slow network never stalls detection
+        self.stream_queue = queue.Queue(maxsize=2)
+        threading.Thread(target=self.stream_worker, daemon=True).start()
+        
         # Initialize models
         self.setup_models()
         self.setup_telegram_bot()
         
+        # Warm the location cache so the first alert doesn't wait on ip-api
+        self.location_future = self.io_pool.submit(self.get_current_location)
+        
     def load_config(self):
         """Load configuration from file"""
         config_file = 'telegram_config.json'
@@ -77,7 +189,8 @@ class WebDrowsinessDetector:
             "chat_ids": [],
             "emergency_threshold": 3.0,
             "max_alerts_per_5min": 5,
-            "admin_password": "admin123"
+            "admin_password": "admin123",
+            "refine_landmarks": False  # iris refinement; EAR/MAR only use the base mesh
         }
         
         if os.path.exists(config_file):
@@ -102,14 +215,9 @@ class WebDrowsinessDetector:
     def setup_models(self):
         """Initialize detection models using original proven algorithm"""
         try:
-            # Initialize MediaPipe Face Mesh
+            # Initialize MediaPipe Face Mesh once; detection_loop reuses it for every frame
             self.mp_face_mesh = mp.solutions.face_mesh
-            self.face_mesh = self.mp_face_mesh.FaceMesh(
-                max_num_faces=1,
-                refine_landmarks=True,
-                min_detection_confidence=0.5,
-                min_tracking_confidence=0.5
-            )
+            self.face_mesh = self.create_face_mesh()
             
             # Face mesh points for ROI extraction (original configuration)
             self.points_ids = [13, 14, 15, 33, 7, 163, 144]
@@ -125,7 +233,6 @@ class WebDrowsinessDetector:
             self.yawn_duration = 0.0
             
             # Device detection
-            import torch
             self.device = 'cuda' if torch.cuda.is_available() else 'cpu'
             
             # Try to load YOLO models for eye and yawn detection
@@ -156,6 +263,24 @@ class WebDrowsinessDetector:
             self.microsleeps = 0.0
             self.yawn_duration = 0.0
     
+    def create_face_mesh(self):
+        """Create the face landmark model, preferring the VIDEO-mode FaceLandmarker"""
+        if MP_TASKS_AVAILABLE and os.path.exists(FACE_LANDMARKER_MODEL):
+            try:
+                face_mesh = VideoFaceLandmarker(FACE_LANDMARKER_MODEL)
+                print("✅ FaceLandmarker loaded (VIDEO mode)")
+                return face_mesh
+            except Exception as e:
+                print(f"⚠️ FaceLandmarker unavailable, using Face Mesh: {e}")
+        
+        # Lower tracking confidence keeps MediaPipe in its cheaper tracking mode between detections
+        return self.mp_face_mesh.FaceMesh(
+            max_num_faces=1,
+            refine_landmarks=self.config.get('refine_landmarks', False),
+            min_detection_confidence=0.5,
+            min_tracking_confidence=0.3
+        )
+    
     def setup_telegram_bot(self):
         """Setup Telegram bot with current config"""
         if self.config.get('bot_token') and self.config.get('chat_ids'):
@@ -168,10 +293,24 @@ class WebDrowsinessDetector:
         else:
             print("⚠️ Telegram bot not configured")
     
+    def load_location_cache(self):
+        """Restore the last IP geolocation result from disk"""
+        if os.path.exists(LOCATION_CACHE_FILE):
+            try:
+                with open(LOCATION_CACHE_FILE, 'r') as f:
+                    cached = json.load(f)
+                self.current_location = cached['location']
+                self.location_cache_time = cached['fetched_at']
+            except (OSError, ValueError, KeyError):
+                pass
+    
     def get_current_location(self):
-        """Get current location using IP geolocation"""
+        """Get current location using IP geolocation (cached for location_ttl seconds)"""
+        if self.location_cache_time is not None and time.time() - self.location_cache_time < self.location_ttl:
+            return self.current_location
+        
         try:
-            response = requests.get('http://ip-api.com/json/', timeout=5)
+            response = self.http.get('http://ip-api.com/json/', timeout=5)
             if response.status_code == 200:
                 data = response.json()
                 if data['status'] == 'success':
@@ -180,6 +319,9 @@ class WebDrowsinessDetector:
                         "lng": data.get('lon', 0),
                         "address": f"{data.get('city', 'Unknown')}, {data.get('regionName', 'Unknown')}, {data.get('country', 'Unknown')}"
                     }
+                    self.location_cache_time = time.time()
+                    with open(LOCATION_CACHE_FILE, 'w') as f:
+                        json.dump({"location": self.current_location, "fetched_at": self.location_cache_time}, f)
         except Exception as e:
             print(f"❌ Location fetch failed: {e}")
         
@@ -212,9 +354,6 @@ class WebDrowsinessDetector:
             self.stats["session_start"] = datetime.now()
             self.stats["session_alerts"] = 0
             
-            # Reinitialize MediaPipe to avoid timestamp issues
-            self.setup_models()
-            
             # Start detection thread
             detection_thread = threading.Thread(target=self.detection_loop)
             detection_thread.daemon = True
@@ -241,33 +380,51 @@ class WebDrowsinessDetector:
             
         print("✅ Detection stopped")
     
+    def capture_frames(self, camera, frame_queue):
+        """Capture thread: read frames and keep only the latest in frame_queue"""
+        while self.detection_active and camera.isOpened():
+            ret, frame = camera.read()
+            if not ret:
+                print("⚠️ Failed to read frame")
+                time.sleep(0.01)
+                continue
+            
+            # Drop the unconsumed frame so inference always gets the newest one
+            try:
+                frame_queue.get_nowait()
+            except queue.Empty:
+                pass
+            frame_queue.put_nowait(frame)
+    
     def detection_loop(self):
         """Simplified robust detection loop"""
         print("🎥 Detection loop started with simplified algorithm")
         
         # FPS tracking
         fps_counter = 0
-        fps_start_time = time.time()
+        fps_start_time = time.monotonic()
+        frame_deadline = fps_start_time
         
         # Detection variables
         eyes_closed_frames = 0
         yawn_frames = 0
         continuous_sleep_time = 0.0
         
+        # Pipeline: capture thread -> this loop -> stream_worker, each stage keeping only fresh frames
+        frame_queue = queue.Queue(maxsize=1)
+        threading.Thread(target=self.capture_frames, args=(self.camera, frame_queue), daemon=True).start()
+        
         try:
             while self.detection_active and self.camera:
-                loop_start = time.time()
-                
-                ret, frame = self.camera.read()
-                if not ret:
-                    print("⚠️ Failed to read frame")
-                    time.sleep(0.01)
+                try:
+                    frame = frame_queue.get(timeout=0.1)
+                except queue.Empty:
                     continue
                 
                 # FPS calculation
                 fps_counter += 1
                 if fps_counter % 30 == 0:
-                    current_time = time.time()
+                    current_time = time.monotonic()
                     current_fps = 30 / (current_time - fps_start_time)
                     fps_start_time = current_time
                     self.stats["fps"] = round(current_fps, 1)
@@ -280,62 +437,53 @@ class WebDrowsinessDetector:
                 yawn_detected = False
                 
                 try:
-                    # Create a new MediaPipe instance for each frame to avoid timestamp issues
-                    with mp.solutions.face_mesh.FaceMesh(
-                        max_num_faces=1,
-                        refine_landmarks=True,
-                        min_detection_confidence=0.5,
-                        min_tracking_confidence=0.5
-                    ) as face_mesh:
-                        
-                        # Face detection using MediaPipe
-                        image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                        results = face_mesh.process(image_rgb)
+                    # Face detection using MediaPipe
+                    image_rgb = self.prepare_mesh_input(frame)
+                    results = self.face_mesh.process(image_rgb)
 
-                        if results.multi_face_landmarks:
-                            face_landmarks = results.multi_face_landmarks[0]
+                    if results.multi_face_landmarks:
+                        face_landmarks = results.multi_face_landmarks[0]
+                        
+                        # Simple EAR/MAR calculation on one gather of the needed landmarks
+                        ear, mar = self.calculate_ratios(face_landmarks)
+                        
+                        # Eye closure detection
+                        if ear < 0.25:  # Eyes closed
+                            eyes_closed_frames += 1
+                            continuous_sleep_time += 1/30  # Add frame time
                             
-                            # Simple EAR/MAR calculation
-                            ear = self.calculate_ear_simple(face_landmarks)
-                            mar = self.calculate_mar_simple(face_landmarks)
+                            # Only mark as drowsy if eyes have been closed for more than 1 second
+                            if continuous_sleep_time > 1.0:
+                                drowsy = True
                             
-                            # Eye closure detection
-                            if ear < 0.25:  # Eyes closed
-                                eyes_closed_frames += 1
-                                continuous_sleep_time += 1/30  # Add frame time
+                            # Detect blink (short closure) - only log every 10th to reduce spam
+                            if eyes_closed_frames == 3:  # Just closed
+                                self.stats["blink_count"] += 1
+                                self.stats["total_blinks"] += 1
+                                blink_detected = True
+                                if self.stats["blink_count"] % 10 == 0:
+                                    print(f"👁️ Blinks: {self.stats['blink_count']}")
                                 
-                                # Only mark as drowsy if eyes have been closed for more than 1 second
-                                if continuous_sleep_time > 1.0:
-                                    drowsy = True
-                                
-                                # Detect blink (short closure) - only log every 10th to reduce spam
-                                if eyes_closed_frames == 3:  # Just closed
-                                    self.stats["blink_count"] += 1
-                                    self.stats["total_blinks"] += 1
-                                    blink_detected = True
-                                    if self.stats["blink_count"] % 10 == 0:
-                                        print(f"👁️ Blinks: {self.stats['blink_count']}")
-                                    
-                            else:  # Eyes open
-                                if eyes_closed_frames > 0 and continuous_sleep_time > 1.0:
-                                    print(f"👁️ Eyes opened after {continuous_sleep_time:.1f}s")
-                                eyes_closed_frames = 0
-                                continuous_sleep_time = max(0, continuous_sleep_time - 0.05)  # Gradual decrease
-                            
-                            # Yawn detection
-                            if mar > 0.6:  # Yawn threshold (lowered for better detection)
-                                yawn_frames += 1
-                                if yawn_frames == 10:  # Just started yawning
-                                    self.stats["yawn_count"] += 1
-                                    self.stats["total_yawns"] += 1
-                                    yawn_detected = True
-                                    print(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
-                            else:
-                                yawn_frames = 0
-                            
-                            # Update stats
-                            self.stats["avg_ear"] = round(continuous_sleep_time, 2)
-                            self.stats["avg_mar"] = round(mar, 3)
+                        else:  # Eyes open
+                            if eyes_closed_frames > 0 and continuous_sleep_time > 1.0:
+                                print(f"👁️ Eyes opened after {continuous_sleep_time:.1f}s")
+                            eyes_closed_frames = 0
+                            continuous_sleep_time = max(0, continuous_sleep_time - 0.05)  # Gradual decrease
+                        
+                        # Yawn detection
+                        if mar > 0.6:  # Yawn threshold (lowered for better detection)
+                            yawn_frames += 1
+                            if yawn_frames == 10:  # Just started yawning
+                                self.stats["yawn_count"] += 1
+                                self.stats["total_yawns"] += 1
+                                yawn_detected = True
+                                print(f"🥱 Yawn detected! Total: {self.stats['yawn_count']}")
+                        else:
+                            yawn_frames = 0
+                        
+                        # Update stats
+                        self.stats["avg_ear"] = round(continuous_sleep_time, 2)
+                        self.stats["avg_mar"] = round(mar, 3)
 
                 except Exception as e:
                     print(f"⚠️ Detection error: {e}")
@@ -347,69 +495,88 @@ class WebDrowsinessDetector:
                     self.handle_drowsiness_alert(continuous_sleep_time)
                     # Don't reset here, let it continue counting
                 
-                # Encode frame for streaming (clean feed)
-                encode_params = [cv2.IMWRITE_JPEG_QUALITY, 85]
-                _, buffer = cv2.imencode('.jpg', frame, encode_params)
-                frame_data = base64.b64encode(buffer).decode('utf-8')
-                
-                # Emit frame with detection data
-                socketio.emit('video_frame', {
-                    'frame': frame_data,
-                    'drowsy': bool(drowsy),
-                    'continuous_sleep': round(continuous_sleep_time, 2),
-                    'blink_detected': blink_detected,
-                    'yawn_detected': yawn_detected,
-                    'fps': self.stats["fps"],
-                    'timestamp': datetime.now().isoformat()
-                })
+                # Hand the clean frame to the stream worker; drop it if the worker is behind
+                # (camera.read() returns a fresh array each call, so no copy is needed)
+                try:
+                    self.stream_queue.put_nowait((frame, {
+                        'drowsy': bool(drowsy),
+                        'continuous_sleep': round(continuous_sleep_time, 2),
+                        'blink_detected': blink_detected,
+                        'yawn_detected': yawn_detected,
+                        'fps': self.stats["fps"]
+                    }))
+                except queue.Full:
+                    pass
                 
-                # Maintain target FPS
-                loop_time = time.time() - loop_start
-                target_time = 0.033
-                if loop_time < target_time:
-                    time.sleep(target_time - loop_time)
+                # New frames pace the loop; the deadline only caps it at 30 FPS and
+                # resets after a slow iteration instead of sleeping through the catch-up
+                frame_deadline = max(frame_deadline + 1 / 30, time.monotonic())
+                time.sleep(max(0.0, frame_deadline - time.monotonic()))
                 
         except Exception as e:
             print(f"❌ Detection loop error: {e}")
         finally:
             print("🛑 Detection loop ended")
     
-    def predict_eye(self, eye_frame, eye_state):
-        """Original eye prediction method"""
-        if eye_frame.size == 0:
-            return eye_state
+    def stream_worker(self):
+        """Encode queued frames and emit them to web clients, off the detection thread"""
+        while True:
+            frame, data = self.stream_queue.get()
+            try:
+                # Emit frame with detection data (bytes go out as a binary attachment)
+                data['frame'] = self.encode_jpeg(frame)
+                socketio.emit('video_frame', data)
+            except Exception as e:
+                print(f"⚠️ Frame stream error: {e}")
+    
+    def encode_jpeg(self, frame, quality=85):
+        """Encode a BGR frame as JPEG bytes"""
+        if self.jpeg is not None:
+            return self.jpeg.encode(frame, quality=quality, jpeg_subsample=TJSAMP_420)
+        _, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        return buffer.tobytes()
+    
+    # YOLO path: detection_loop runs on MediaPipe EAR/MAR only, so predict_eyes/predict_yawn have no callers
+    def predict_eyes(self, left_eye_frame, right_eye_frame):
+        """Predict both eye states (open/closed) in a single batched forward pass"""
+        states = [self.left_eye_state, self.right_eye_state]
+        eye_frames = [(slot, eye_frame) for slot, eye_frame in enumerate((left_eye_frame, right_eye_frame))
+                      if eye_frame.size > 0]
+        if not eye_frames:
+            return tuple(states)
             
         try:
             # Inference settings based on device
             conf_threshold = 0.25 if self.device == 'cuda' else 0.3
             
-            results_eye = self.detecteye.predict(
-                eye_frame, 
-                device=self.device,
-                verbose=False,
-                conf=conf_threshold,
-                iou=0.45
-            )
-            
-            boxes = results_eye[0].boxes
-            if len(boxes) == 0:
-                return eye_state
-
-            confidences = boxes.conf.cpu().numpy()  
-            class_ids = boxes.cls.cpu().numpy()  
-            max_confidence_index = np.argmax(confidences)
-            class_id = int(class_ids[max_confidence_index])
-            confidence = confidences[max_confidence_index]
+            with torch.inference_mode():
+                results_eye = self.detecteye.predict(
+                    [eye_frame for _, eye_frame in eye_frames],
+                    device=self.device,
+                    verbose=False,
+                    conf=conf_threshold,
+                    iou=0.45
+                )
+            
+            for (slot, _), result in zip(eye_frames, results_eye):
+                boxes = result.boxes
+                if len(boxes) == 0:
+                    continue
+                
+                # argmax on the device; only two scalars cross to the host
+                max_confidence_index = int(boxes.conf.argmax())
+                class_id = int(boxes.cls[max_confidence_index])
+                confidence = float(boxes.conf[max_confidence_index])
 
-            if class_id == 1 and confidence > 0.3:  # Closed eye
-                eye_state = "Close Eye"
-            elif class_id == 0 and confidence > 0.25:  # Open eye
-                eye_state = "Open Eye"
+                if class_id == 1 and confidence > 0.3:  # Closed eye
+                    states[slot] = "Close Eye"
+                elif class_id == 0 and confidence > 0.25:  # Open eye
+                    states[slot] = "Open Eye"
                                 
         except Exception as e:
             print(f"Eye prediction error: {e}")
             
-        return eye_state
+        return tuple(states)
 
     def predict_yawn(self, yawn_frame):
         """Original yawn prediction method"""
@@ -419,23 +586,23 @@ class WebDrowsinessDetector:
         try:
             conf_threshold = 0.3 if self.device == 'cuda' else 0.35
             
-            results_yawn = self.detectyawn.predict(
-                yawn_frame,
-                device=self.device,
-                verbose=False,
-                conf=conf_threshold,
-                iou=0.45
-            )
+            with torch.inference_mode():
+                results_yawn = self.detectyawn.predict(
+                    yawn_frame,
+                    device=self.device,
+                    verbose=False,
+                    conf=conf_threshold,
+                    iou=0.45
+                )
             
             boxes = results_yawn[0].boxes
             if len(boxes) == 0:
                 return
 
-            confidences = boxes.conf.cpu().numpy()  
-            class_ids = boxes.cls.cpu().numpy()  
-            max_confidence_index = np.argmax(confidences)
-            class_id = int(class_ids[max_confidence_index])
-            confidence = confidences[max_confidence_index]
+            # argmax on the device; only two scalars cross to the host
+            max_confidence_index = int(boxes.conf.argmax())
+            class_id = int(boxes.cls[max_confidence_index])
+            confidence = float(boxes.conf[max_confidence_index])
 
             if class_id == 0 and confidence > 0.4:  # Yawn
                 self.yawn_state = "Yawn"
@@ -445,40 +612,37 @@ class WebDrowsinessDetector:
         except Exception as e:
             print(f"Yawn prediction error: {e}")
     
+    def prepare_mesh_input(self, frame):
+        """Downscale a BGR frame and convert it to RGB, reusing preallocated buffers"""
+        if self.gpu_frame is not None:
+            try:
+                self.gpu_frame.upload(frame)
+                cv2.cuda.resize(self.gpu_frame, self.mesh_input_size, dst=self.gpu_small, interpolation=cv2.INTER_AREA)
+                cv2.cuda.cvtColor(self.gpu_small, cv2.COLOR_BGR2RGB, dst=self.gpu_rgb)
+                return self.gpu_rgb.download(dst=self.rgb_buffer)
+            except cv2.error as e:
+                print(f"⚠️ OpenCV CUDA preprocessing failed, using CPU: {e}")
+                self.gpu_frame = None
+        small = cv2.resize(frame, self.mesh_input_size, dst=self.mesh_buffer, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2RGB, dst=self.rgb_buffer)
+    
+    @staticmethod
+    def landmark_points(landmarks, indices):
+        """Gather (x, y) of the given landmarks into an (N, 2) array"""
+        lm = landmarks.landmark
+        return np.array([(lm[i].x, lm[i].y) for i in indices], dtype=np.float32)
+    
     def calculate_ear_fallback(self, landmarks):
         """Fallback EAR calculation using MediaPipe landmarks"""
         try:
-            # Left eye landmarks
-            left_eye = [33, 7, 163, 144, 145, 153]
-            # Right eye landmarks  
-            right_eye = [362, 382, 381, 380, 374, 373]
-            
-            def get_ear(eye_points):
-                # Get coordinates
-                coords = []
-                for i in eye_points:
-                    lm = landmarks.landmark[i]
-                    coords.append([lm.x, lm.y])
-                coords = np.array(coords)
-                
-                # Calculate distances
-                # Vertical distances
-                v1 = np.linalg.norm(coords[1] - coords[5])
-                v2 = np.linalg.norm(coords[2] - coords[4])
-                
-                # Horizontal distance
-                h = np.linalg.norm(coords[0] - coords[3])
-                
-                # EAR calculation
-                if h > 0:
-                    return (v1 + v2) / (2.0 * h)
-                return 0.3
-            
-            # Calculate EAR for both eyes
-            left_ear = get_ear(left_eye)
-            right_ear = get_ear(right_eye)
+            # Per eye (v1, v2, h) from one gather of both endpoints
+            pts = self.landmark_points(landmarks, FALLBACK_EAR_IDX)
+            d = np.linalg.norm(pts[:6] - pts[6:], axis=1).reshape(2, 3)
+            v, h = d[:, :2].sum(axis=1), d[:, 2]
             
-            return (left_ear + right_ear) / 2.0
+            # EAR calculation
+            ears = np.where(h > 0, v / (2.0 * np.where(h > 0, h, 1.0)), 0.3)
+            return float(ears.mean())
             
         except Exception as e:
             return 0.3
@@ -486,93 +650,66 @@ class WebDrowsinessDetector:
     def calculate_mar_fallback(self, landmarks):
         """Fallback MAR calculation using MediaPipe landmarks"""
         try:
-            # Mouth landmarks
-            mouth_points = [61, 84, 17, 314, 405, 320, 307, 375]
-            
-            # Get coordinates
-            coords = []
-            for i in mouth_points:
-                lm = landmarks.landmark[i]
-                coords.append([lm.x, lm.y])
-            coords = np.array(coords)
-            
-            # Calculate vertical distances
-            v1 = np.linalg.norm(coords[2] - coords[6])  # Top to bottom
-            v2 = np.linalg.norm(coords[3] - coords[7])  # Top to bottom
-            
-            # Calculate horizontal distance
-            h = np.linalg.norm(coords[0] - coords[1])  # Left to right
+            # Two vertical distances and the horizontal one from one gather
+            pts = self.landmark_points(landmarks, FALLBACK_MAR_IDX)
+            v1, v2, h = np.linalg.norm(pts[:3] - pts[3:], axis=1)
             
             # MAR calculation
             if h > 0:
-                return (v1 + v2) / (2.0 * h)
+                return float((v1 + v2) / (2.0 * h))
             return 0.0
             
         except Exception as e:
             return 0.0
     
-    def calculate_ear_simple(self, landmarks):
-        """Simple EAR calculation"""
+    def calculate_ear_simple(self, pts):
+        """Simple EAR calculation from points gathered in RATIO_IDX order"""
         try:
-            # Left eye landmarks (simplified)
-            left_eye = [33, 160, 158, 133, 153, 144]
-            # Right eye landmarks (simplified)
-            right_eye = [362, 385, 387, 263, 373, 380]
-            
-            def get_ear(eye_points):
-                coords = []
-                for i in eye_points:
-                    lm = landmarks.landmark[i]
-                    coords.append([lm.x, lm.y])
-                coords = np.array(coords)
-                
-                # Vertical distances
-                v1 = np.linalg.norm(coords[1] - coords[5])
-                v2 = np.linalg.norm(coords[2] - coords[4])
-                
-                # Horizontal distance
-                h = np.linalg.norm(coords[0] - coords[3])
-                
-                if h > 0:
-                    return (v1 + v2) / (2.0 * h)
-                return 0.3
-            
-            left_ear = get_ear(left_eye)
-            right_ear = get_ear(right_eye)
+            # (v1, v2, h) for each eye in one vectorized norm
+            d = np.linalg.norm(pts[EAR_ROWS_A] - pts[EAR_ROWS_B], axis=1).reshape(2, 3)
+            v, h = d[:, :2].sum(axis=1), d[:, 2]
             
-            return (left_ear + right_ear) / 2.0
+            ears = np.where(h > 0, v / (2.0 * np.where(h > 0, h, 1.0)), 0.3)
+            return float(ears.mean())
             
         except Exception as e:
             return 0.3
     
-    def calculate_mar_simple(self, landmarks):
-        """Simple MAR calculation"""
+    def calculate_mar_simple(self, pts):
+        """Simple MAR calculation from points gathered in RATIO_IDX order"""
         try:
-            # Mouth landmarks (simplified)
-            mouth_points = [13, 14, 269, 270, 267, 271, 272, 17]
-            
-            coords = []
-            for i in mouth_points:
-                lm = landmarks.landmark[i]
-                coords.append([lm.x, lm.y])
-            coords = np.array(coords)
-            
-            # Vertical distance (mouth opening)
-            v1 = np.linalg.norm(coords[1] - coords[7])  # Top to bottom lip
-            
-            # Horizontal distance (mouth width)
-            h = np.linalg.norm(coords[0] - coords[4])  # Left to right corner
+            # Mouth opening (14-17) and width (13-267)
+            v, h = np.linalg.norm(pts[MAR_ROWS_A] - pts[MAR_ROWS_B], axis=1)
             
             if h > 0:
-                return v1 / h
+                return float(v / h)
             return 0.0
             
         except Exception as e:
             return 0.0
     
+    def calculate_ratios(self, landmarks):
+        """Return (EAR, MAR), using the Numba kernel when available"""
+        pts = gather_ratio_points(landmarks, self.ratio_points)
+        if NUMBA_AVAILABLE:
+            return ear_mar(pts)
+        return self.calculate_ear_simple(pts), self.calculate_mar_simple(pts)
+    
     def handle_drowsiness_alert(self, duration):
-        """Handle drowsiness alert"""
-        location = self.get_current_location()
+        """Handle drowsiness alert (network calls are dispatched to the I/O pool)"""
+        # The previous alert is still being delivered; don't pile up more behind it
+        if self.alert_future and not self.alert_future.done():
+            return
+        # Sustained drowsiness crosses the threshold on every frame; alert once per cooldown
+        now = time.monotonic()
+        if self.last_alert_time is not None and now - self.last_alert_time < self.alert_cooldown:
+            return
+        self.last_alert_time = now
+        
+        # Use the last known location and refresh it in the background
+        location = self.current_location
+        if self.location_future is None or self.location_future.done():
+            self.location_future = self.io_pool.submit(self.get_current_location)
         timestamp = datetime.now()
         
         alert_data = {
@@ -587,6 +724,12 @@ class WebDrowsinessDetector:
         self.stats["session_alerts"] += 1
         self.stats["last_alert"] = timestamp.isoformat()
         
+        self.alert_future = self.io_pool.submit(self.dispatch_alert, alert_data, duration)
+        
+        print(f"🚨 Drowsiness alert: {duration:.1f}s at {location['address']}")
+    
+    def dispatch_alert(self, alert_data, duration):
+        """Deliver an alert to Telegram and web clients"""
         # Send Telegram alert
         if self.telegram_bot:
             success = self.telegram_bot.send_emergency_alert(duration)
@@ -597,8 +740,6 @@ class WebDrowsinessDetector:
         
         # Emit to web clients
         socketio.emit('drowsiness_alert', alert_data)
-        
-        print(f"🚨 Drowsiness alert: {duration:.1f}s at {location['address']}")
 
 # Global detector instance
 detector = WebDrowsinessDetector()
@@ -727,7 +868,7 @@ def get_telegram_updates():
     
     try:
         url = f"https://api.telegram.org/bot{bot_token}/getUpdates"
-        response = requests.get(url, timeout=10)
+        response = detector.http.get(url, timeout=10)
         
         if response.status_code == 200:
             data = response.json()
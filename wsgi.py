@@ -0,0 +1,17 @@
+#!/usr/bin/env python3
+"""
+WSGI entrypoint for the Cloud Dashboard
+
+    gunicorn -k eventlet -w 1 --worker-connections 2000 --bind 0.0.0.0:5000 wsgi:app
+
+Socket.IO needs sticky sessions, which gunicorn's load balancing can't provide,
+so the dashboard runs as a single eventlet worker. Run one instance only: device
+stats, counters and the recent-alert window live in that process's memory, so
+several instances would each show a different view of the fleet.
+"""
+
+from cloud_dashboard import app
+
+if __name__ == '__main__':
+    from cloud_dashboard import socketio
+    socketio.run(app, host='0.0.0.0', port=5000, debug=False)